@@ -0,0 +1,301 @@
+import cv2
+import numpy as np
+
+# Parameters per camera: fx, fy, cx, cy and the k1, k2, p1, p2, k3
+# distortion terms of OpenCV's default model. Poses are a Rodrigues vector
+# and a translation.
+INTRINSICS = 9
+POSE = 6
+CAMERA = INTRINSICS + POSE
+
+# Observations whose derivatives are held in memory at once.
+CHUNK_SIZE = 4096
+
+def skew(vectors):
+    '''
+    Cross product matrices (..., 3, 3) of vectors (..., 3).
+    '''
+    K = np.zeros(vectors.shape + (3,))
+    K[..., 0, 1], K[..., 0, 2] = -vectors[..., 2], vectors[..., 1]
+    K[..., 1, 0], K[..., 1, 2] = vectors[..., 2], -vectors[..., 0]
+    K[..., 2, 0], K[..., 2, 1] = -vectors[..., 1], vectors[..., 0]
+    return K
+
+def rodrigues(rvecs):
+    '''
+    Rotation matrices (M, 3, 3) for Rodrigues vectors (M, 3).
+    '''
+    angle = np.linalg.norm(rvecs, axis=1)
+    K = skew(rvecs / np.maximum(angle, 1e-12)[:, None])
+    sin = np.sin(angle)[:, None, None]
+    cos = np.cos(angle)[:, None, None]
+    return np.eye(3) + sin * K + (1 - cos) * (K @ K)
+
+def rodrigues_jacobian(rvecs):
+    '''
+    Left Jacobians (M, 3, 3) of the rotation vectors: R(r + d) is R(r)
+    turned by J d to first order, so d(R p)/dr = -[R p]x J.
+    '''
+    angle = np.linalg.norm(rvecs, axis=1)[:, None, None]
+    small = angle < 1e-8
+    angle = np.where(small, 1.0, angle)
+    K = skew(rvecs)
+    a = np.where(small, 0.5, (1 - np.cos(angle)) / angle ** 2)
+    b = np.where(small, 1 / 6, (angle - np.sin(angle)) / angle ** 3)
+    return np.eye(3) + a * K + b * (K @ K)
+
+def pose_vector(R, t):
+    '''
+    A pose as its Rodrigues vector followed by its translation.
+    '''
+    return np.concatenate([cv2.Rodrigues(R)[0].ravel(), np.ravel(t)])
+
+def intrinsics_vector(mtx, dist):
+    '''
+    fx, fy, cx, cy and the five distortion terms of a camera, zero for
+    the terms dist leaves out.
+    '''
+    vector = np.zeros(INTRINSICS)
+    vector[:4] = mtx[0, 0], mtx[1, 1], mtx[0, 2], mtx[1, 2]
+    if dist is not None:
+        dist = np.ravel(dist)[:5]
+        vector[4:4 + len(dist)] = dist
+    return vector
+
+def project(objp, intrinsics, cameras, boards, camera_index, board_index, jacobian=False):
+    '''
+    Image points (observations, N, 2) of the board corners for every
+    observation at once. Each observation is the board of one frame,
+    board_index into boards, seen by one camera, camera_index into
+    cameras and intrinsics.
+
+    With jacobian, also returns the derivatives (observations, N, 2, 21)
+    of each point with respect to its camera's intrinsics, its camera's
+    pose and its board's pose, in that order.
+    '''
+    # Only the boards observed are turned into matrices, as boards may hold
+    # far more poses than one call looks at.
+    R_b = rodrigues(boards[board_index, :3])
+    R_c = rodrigues(cameras[:, :3])[camera_index]
+    turned = objp @ R_b.transpose(0, 2, 1)
+    world = turned + boards[board_index, None, 3:]
+    points = world @ R_c.transpose(0, 2, 1) + cameras[camera_index, None, 3:]
+    z = points[..., 2]
+    x = points[..., 0] / z
+    y = points[..., 1] / z
+    fx, fy, cx, cy, k1, k2, p1, p2, k3 = (intrinsics[camera_index, i, None] for i in range(INTRINSICS))
+    r2 = x * x + y * y
+    radial = 1 + r2 * (k1 + r2 * (k2 + r2 * k3))
+    xd = x * radial + 2 * p1 * x * y + p2 * (r2 + 2 * x * x)
+    yd = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * x * y
+    projected = np.stack([fx * xd + cx, fy * yd + cy], axis=-1)
+    if not jacobian:
+        return projected
+
+    J = np.zeros(projected.shape + (INTRINSICS + 2 * POSE,))
+    zeros = np.zeros_like(x)
+    ones = np.ones_like(x)
+    J[..., 0, :INTRINSICS] = np.stack([xd, zeros, ones, zeros, fx * x * r2, fx * x * r2 ** 2, fx * 2 * x * y, fx * (r2 + 2 * x * x), fx * x * r2 ** 3], axis=-1)
+    J[..., 1, :INTRINSICS] = np.stack([zeros, yd, zeros, ones, fy * y * r2, fy * y * r2 ** 2, fy * (r2 + 2 * y * y), fy * 2 * x * y, fy * y * r2 ** 3], axis=-1)
+
+    # Image point against the normalized point (x, y), then against the
+    # point in camera coordinates.
+    slope = k1 + r2 * (2 * k2 + 3 * k3 * r2)
+    distortion = np.stack([
+        np.stack([radial + 2 * x * x * slope + 2 * p1 * y + 6 * p2 * x, 2 * x * y * slope + 2 * p1 * x + 2 * p2 * y], axis=-1),
+        np.stack([2 * x * y * slope + 2 * p1 * x + 2 * p2 * y, radial + 2 * y * y * slope + 6 * p1 * y + 2 * p2 * x], axis=-1),
+    ], axis=-2)
+    distortion[..., 0, :] *= fx[..., None]
+    distortion[..., 1, :] *= fy[..., None]
+    division = np.stack([
+        np.stack([1 / z, zeros, -x / z], axis=-1),
+        np.stack([zeros, 1 / z, -y / z], axis=-1),
+    ], axis=-2)
+    to_camera = distortion @ division
+
+    camera_rotation = -skew(points - cameras[camera_index, None, 3:]) @ rodrigues_jacobian(cameras[:, :3])[camera_index, None]
+    board_rotation = R_c[:, None] @ (-skew(turned) @ rodrigues_jacobian(boards[board_index, :3])[:, None])
+    J[..., INTRINSICS:INTRINSICS + 3] = to_camera @ camera_rotation
+    J[..., INTRINSICS + 3:INTRINSICS + POSE] = to_camera
+    J[..., INTRINSICS + POSE:INTRINSICS + POSE + 3] = to_camera @ board_rotation
+    J[..., INTRINSICS + POSE + 3:] = to_camera @ R_c[:, None]
+    return projected, J
+
+class BundleAdjustment:
+    '''
+    Refines the intrinsics and poses of every camera of a RigCalibration
+    together with the pose of every board, minimizing the reprojection
+    error of all observations by Levenberg-Marquardt.
+
+    Each residual depends on one camera's 15 parameters and one board's 6,
+    so the normal equations have a small block per camera, a 6x6 block per
+    board and a coupling block per observation. The board blocks are
+    eliminated first (the Schur complement), which leaves a dense system
+    of 15 unknowns per camera however many boards there are. The board
+    steps then follow from the camera step one frame at a time.
+    Derivatives are analytic and evaluated for all observations at once,
+    in chunks of chunk_size to bound memory.
+
+    The reference camera's pose stays fixed, as does the distortion of
+    cameras calibrated without it, and with fix_intrinsics all intrinsics.
+    '''
+    def __init__(self, rig, fix_intrinsics=False, chunk_size=CHUNK_SIZE):
+        self.rig = rig
+        self.chunk_size = chunk_size
+        self.objp = np.asarray(rig.objp, dtype=np.float64).reshape(-1, 3)
+        self.camera_ids = rig.connected()
+        self.frames = sorted(rig.observations)
+        camera_slot = {camera: i for i, camera in enumerate(self.camera_ids)}
+
+        camera_index = []
+        board_index = []
+        corners = []
+        for i, frame in enumerate(self.frames):
+            for camera, points in rig.observations[frame].items():
+                camera_index.append(camera_slot[camera])
+                board_index.append(i)
+                corners.append(points)
+        self.camera_index = np.asarray(camera_index)
+        self.board_index = np.asarray(board_index)
+        self.corners = np.asarray(corners, dtype=np.float64)
+
+        # Observations come grouped by frame. Every pair of observations of
+        # one frame couples their cameras in the Schur complement.
+        starts = np.flatnonzero(np.diff(self.board_index, prepend=-1))
+        ends = np.append(starts[1:], len(self.board_index))
+        pairs = [np.stack(np.meshgrid(np.arange(a, b), np.arange(a, b)), axis=-1).reshape(-1, 2) for a, b in zip(starts, ends)]
+        self.pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=int)
+
+        cameras = len(self.camera_ids)
+        self.intrinsics = np.zeros((cameras, INTRINSICS))
+        self.poses = np.zeros((cameras, POSE))
+        self.free = np.ones((cameras, CAMERA), dtype=bool)
+        for i, camera in enumerate(self.camera_ids):
+            self.intrinsics[i] = intrinsics_vector(*rig.cameras[camera])
+            if not np.any(self.intrinsics[i, 4:]):
+                self.free[i, 4:INTRINSICS] = False
+            self.poses[i] = pose_vector(*rig.extrinsics[camera])
+            if camera == rig.reference:
+                self.free[i, INTRINSICS:] = False
+        if fix_intrinsics:
+            self.free[:, :INTRINSICS] = False
+        self.boards = np.zeros((len(self.frames), POSE))
+        for i, frame in enumerate(self.frames):
+            self.boards[i] = pose_vector(*rig.board_poses[frame])
+
+    def cost(self, intrinsics, poses, boards):
+        projected = project(self.objp, intrinsics, poses, boards, self.camera_index, self.board_index)
+        return float(np.sum((projected - self.corners) ** 2))
+
+    def normal_equations(self):
+        '''
+        The blocks of JᵀJ and Jᵀr: per camera (cameras, 15, 15), per
+        observation coupling (observations, 15, 6), per board
+        (boards, 6, 6), and the gradients for cameras and boards.
+        '''
+        cameras = len(self.camera_ids)
+        U = np.zeros((cameras, CAMERA, CAMERA))
+        W = np.zeros((len(self.corners), CAMERA, POSE))
+        V = np.zeros((len(self.frames), POSE, POSE))
+        g_cameras = np.zeros((cameras, CAMERA))
+        g_boards = np.zeros((len(self.frames), POSE))
+        for start in range(0, len(self.corners), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            camera_index = self.camera_index[chunk]
+            board_index = self.board_index[chunk]
+            projected, J = project(self.objp, self.intrinsics, self.poses, self.boards, camera_index, board_index, jacobian=True)
+            r = (projected - self.corners[chunk]).reshape(len(J), -1)
+            J = J.reshape(len(J), -1, CAMERA + POSE)
+            J_c = J[..., :CAMERA] * self.free[camera_index, None]
+            J_b = J[..., CAMERA:]
+            W[chunk] = np.einsum("ori,orj->oij", J_c, J_b)
+            for camera in range(cameras):
+                seen = camera_index == camera
+                U[camera] += np.einsum("ori,orj->ij", J_c[seen], J_c[seen])
+                g_cameras[camera] += np.einsum("ori,or->i", J_c[seen], r[seen])
+            np.add.at(V, board_index, np.einsum("ori,orj->oij", J_b, J_b))
+            np.add.at(g_boards, board_index, np.einsum("ori,or->oi", J_b, r))
+        return U, W, V, g_cameras, g_boards
+
+    def solve(self, equations, damping):
+        '''
+        The camera and board steps of one damped Gauss-Newton iteration.
+        '''
+        U, W, V, g_cameras, g_boards = equations
+        cameras = len(U)
+        camera_diagonal = (slice(None), np.arange(CAMERA), np.arange(CAMERA))
+        board_diagonal = (slice(None), np.arange(POSE), np.arange(POSE))
+        U = U.copy()
+        V = V.copy()
+        U[camera_diagonal] *= 1 + damping
+        V[board_diagonal] *= 1 + damping
+        # Fixed parameters get a unit diagonal and no gradient, so a zero step.
+        U[camera_diagonal] += ~self.free
+        V_inv = np.linalg.inv(V)
+
+        Y = W @ V_inv[self.board_index]
+        a, b = self.pairs[:, 0], self.pairs[:, 1]
+        S = np.zeros((cameras, CAMERA, cameras, CAMERA))
+        S[np.arange(cameras), :, np.arange(cameras), :] = U
+        np.subtract.at(S, (self.camera_index[a], slice(None), self.camera_index[b]), np.einsum("pij,pkj->pik", Y[a], W[b]))
+        rhs = -g_cameras
+        np.add.at(rhs, self.camera_index, np.einsum("oij,oj->oi", Y, g_boards[self.board_index]))
+        step_cameras = np.linalg.solve(S.reshape(cameras * CAMERA, -1), rhs.ravel()).reshape(cameras, CAMERA)
+
+        rhs = -g_boards
+        np.subtract.at(rhs, self.board_index, np.einsum("oij,oi->oj", W, step_cameras[self.camera_index]))
+        step_boards = np.einsum("fij,fj->fi", V_inv, rhs)
+        return step_cameras, step_boards
+
+    def rms(self, cost):
+        return float(np.sqrt(cost / (len(self.corners) * len(self.objp)))) if len(self.corners) else None
+
+    def run(self, max_iterations=50, tolerance=1e-9, progress=None):
+        '''
+        Iterates until the cost stops falling by more than tolerance
+        relative to its value, then writes the refined cameras, camera
+        poses, board poses and RMS reprojection error back into the rig.
+        progress, if given, is called with a message after every iteration.
+        Returns the number of iterations.
+        '''
+        progress = progress or (lambda msg: None)
+        cost = self.cost(self.intrinsics, self.poses, self.boards)
+        damping = 1e-3
+        iteration = 0
+        while iteration < max_iterations:
+            iteration += 1
+            equations = self.normal_equations()
+            while damping < 1e10:
+                step_cameras, step_boards = self.solve(equations, damping)
+                intrinsics = self.intrinsics + step_cameras[:, :INTRINSICS]
+                poses = self.poses + step_cameras[:, INTRINSICS:]
+                boards = self.boards + step_boards
+                new_cost = self.cost(intrinsics, poses, boards)
+                if new_cost < cost:
+                    break
+                damping *= 10
+            else:
+                break
+            self.intrinsics, self.poses, self.boards = intrinsics, poses, boards
+            damping = max(damping / 10, 1e-9)
+            converged = cost - new_cost < tolerance * cost
+            cost = new_cost
+            progress(f"Bundle adjustment iteration {iteration}, reprojection error {self.rms(cost):.3f} px")
+            if converged:
+                break
+
+        for i, camera in enumerate(self.camera_ids):
+            fx, fy, cx, cy = self.intrinsics[i, :4]
+            mtx = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]])
+            self.rig.cameras[camera] = (mtx, self.intrinsics[i, 4:].reshape(1, 5))
+            self.rig.extrinsics[camera] = (cv2.Rodrigues(self.poses[i, :3])[0], self.poses[i, 3:].reshape(3, 1))
+        for i, frame in enumerate(self.frames):
+            self.rig.board_poses[frame] = (cv2.Rodrigues(self.boards[i, :3])[0], self.boards[i, 3:].reshape(3, 1))
+        self.rig.rms = self.rms(cost)
+        return iteration
+
+def bundle_adjust(rig, fix_intrinsics=False, max_iterations=50, progress=None):
+    '''
+    Jointly refines a RigCalibration in place. See BundleAdjustment.
+    '''
+    return BundleAdjustment(rig, fix_intrinsics).run(max_iterations, progress=progress)
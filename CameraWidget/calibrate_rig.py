@@ -0,0 +1,27 @@
+from PySide6.QtCore import QThread, Signal
+
+from CameraWidget.bundle_adjustment import bundle_adjust
+from CameraWidget.rig_calibration import calibrate_rig
+
+class RigCalibrationThread(QThread):
+    '''
+    Solves a rig with calibrate_rig and bundle adjusts it on its own
+    thread, relaying the messages of both as the progress signal. Once
+    finished, rig holds the result, or None if the solve failed, and
+    initial_rms the reprojection error before bundle adjustment.
+    '''
+    progress = Signal(str)
+    def __init__(self, datasets, nx, ny):
+        super().__init__()
+        self.datasets = datasets
+        self.nx = nx
+        self.ny = ny
+        self.rig = None
+        self.initial_rms = None
+
+    def run(self):
+        rig = calibrate_rig(self.datasets, self.nx, self.ny, progress=self.progress.emit)
+        if len(rig.connected()) > 1:
+            self.initial_rms = rig.rms
+            bundle_adjust(rig, progress=self.progress.emit)
+        self.rig = rig
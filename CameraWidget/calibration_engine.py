@@ -0,0 +1,501 @@
+import itertools
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from CameraWidget.dataset import CalibrationDataset
+from CameraWidget.detection import CRITERIA, detect_oriented, make_detector
+from CameraWidget.detection_cache import CACHE_DIR, DetectionCache
+from CameraWidget.detection_pool import DetectionPool
+from CameraWidget.detector_benchmark import benchmark_detectors, choose_detector, load_sample_frames, summarize
+from CameraWidget.frame_sampler import FrameSampler, bisection_order, sample_indices
+from CameraWidget.online_estimator import OnlineEstimator
+from CameraWidget.pipeline import DetectionPipeline
+from CameraWidget.pose_estimation import estimate_poses
+from CameraWidget.preview import PreviewThrottle, make_thumbnail
+from CameraWidget.reorient import get_reorienter
+from CameraWidget.sharpness import SharpnessGate
+from CameraWidget.tracking import CornerTracker
+from CameraWidget.video_reader import open_reader
+from CameraWidget.view_selection import CoverageMonitor, DuplicateFilter, select_views
+
+class CalibrationEngine:
+    '''
+    Finds chessboard views in a calibration video and solves for the camera
+    intrinsics, without Qt.
+
+    Progress is reported by calling progress with (percent, thumbnail or
+    None, message) from the thread that calls run(). Intermediate solutions
+    are reported by calling estimate with (views found, mtx, dist, RMS
+    reprojection error) from the OnlineEstimator's own thread, so estimate
+    can be called while progress is running and must be thread safe.
+    CameraCalibration relays both as Qt signals, which queue them for the
+    GUI thread.
+    cancel() may be called from any thread; run() then checkpoints the
+    frames searched so far and returns without solving.
+    '''
+    def __init__(
+        self,
+        video_filename,
+        nx,
+        ny,
+        rotate,
+        v_flip,
+        h_flip,
+        sample_rate,
+        distorted,
+        sampling="auto",
+        workers=1,
+        detection_scale=1.0,
+        cache_dir=CACHE_DIR,
+        max_views=60,
+        refine_poses=False,
+        preview_fps=10,
+        reorient_corners=False,
+        queue_depth=4,
+        detect_threads=1,
+        video_backend="auto",
+        tracking=False,
+        anytime=False,
+        min_views=40,
+        min_coverage=0.7,
+        min_poses=10,
+        estimate_interval=2.0,
+        estimate_views=20,
+        detector_engine="classic",
+        sharpness_filter=False,
+        sharpness_fraction=0.5,
+        min_motion=2.0,
+        checkpoint_interval=30.0,
+        progress=None,
+        estimate=None,
+    ):
+        self.video_filename = video_filename
+        self.nx = nx
+        self.ny = ny
+        self.rotate = rotate
+        self.v_flip = v_flip
+        self.h_flip = h_flip
+        self.reorienter = get_reorienter(rotate, v_flip, h_flip)
+        self.sample_rate = sample_rate
+        self.distorted = distorted
+        self.sampling = sampling
+        self.workers = workers
+        self.detection_scale = detection_scale
+        self.cache_dir = cache_dir
+        self.max_views = max_views
+        self.refine_poses = refine_poses
+        self.preview_fps = preview_fps
+        self.reorient_corners = reorient_corners
+        self.queue_depth = queue_depth
+        self.detect_threads = detect_threads
+        self.video_backend = video_backend
+        self.tracking = tracking
+        self.anytime = anytime
+        self.min_views = min_views
+        self.min_coverage = min_coverage
+        self.min_poses = min_poses
+        self.stop_reason = None
+        self.estimate_interval = estimate_interval
+        self.estimate_views = estimate_views
+        self.detector_engine = detector_engine
+        self.engine = None if detector_engine == "auto" else detector_engine
+        self.sharpness_filter = sharpness_filter
+        self.sharpness_fraction = sharpness_fraction
+        self.skipped = 0
+        self.missed = 0
+        self.min_motion = min_motion
+        self.duplicate_filter = None
+        self.checkpoint_interval = checkpoint_interval
+        self.cache = None
+        self.checkpointed = 0
+        self.cancelled = False
+        self.stop_requested = threading.Event()
+        self.progress = progress or (lambda args: None)
+        self.estimate = estimate or (lambda args: None)
+        self.stage_utilization = {}
+        self.criteria = CRITERIA
+        self.objp = np.zeros((nx * ny, 3), np.float32)
+        self.objp[:,:2] = np.mgrid[0:nx, 0:ny].T.reshape(-1, 2)
+        self.dataset = CalibrationDataset(self.objp)
+
+    def cancel(self):
+        self.stop_requested.set()
+
+    def get_calibration(self):
+        return self.dataset
+
+    def zoom(self, img, cx, cy, zoom):
+        h, w, _ = [ zoom * i for i in img.shape ]
+        cx, cy = [ zoom * c for c in (cx, cy) ]
+        img = cv2.resize( img, (0, 0), fx=zoom, fy=zoom)
+        img = img[ int(round(cy - h/zoom * .5)) : int(round(cy + h/zoom * .5)),
+               int(round(cx - w/zoom * .5)) : int(round(cx + w/zoom * .5)),
+               : ]
+        return img
+
+    def draw_chessboard(self, frame, corners, zoom=False, copy=True):
+        img = np.copy(frame) if copy else frame
+        to_int = lambda _: (int(i) for i in _)
+        radius = max(int(abs(corners[0][0][0] - corners[1][0][0]) / 2), 1)
+        thickness = max(radius // 5, 1)
+        x, y = to_int(corners[0][0])
+        cv2.circle(img, (int(x), int(y)), radius, (255, 0, 0), thickness)
+        x, y = to_int(corners[-1][0])
+        cv2.circle(img, (x, y), radius, (0, 0, 255), thickness)
+        for i in range(len(corners) - 1):
+            x1, y1 = to_int(corners[i][0])
+            x2, y2 = to_int(corners[i + 1][0])
+            cv2.line(img, (x1, y1), (x2, y2), (0, 255, 0), thickness)
+
+        if zoom:
+            fx, fy = to_int(corners[-1][0])
+            lx, ly = to_int(corners[0][0])
+            cx = fx + (lx - fx) / 2
+            cy = fy + (ly - fy) / 2
+            zf = min(
+                img.shape[1] / (lx - fx),
+                img.shape[0] / (ly - fy),
+            ) * 0.75
+            img = self.zoom(img, cx, cy, zf)
+
+        return img
+
+    def reorient(self, frame):
+        return self.reorienter(frame)
+
+    def checkpoint(self, analyzed, detections, scores):
+        '''
+        Writes the frames searched so far to the detection cache, which a
+        later run with the same settings resumes from.
+        '''
+        if self.cache is None or self.shape is None or len(analyzed) == self.checkpointed:
+            return
+        self.cache.save(self.shape, analyzed, detections, scores)
+        self.checkpointed = len(analyzed)
+
+    def get_cache(self):
+        if self.cache_dir is None:
+            return None
+        return DetectionCache(
+            self.video_filename,
+            dict(
+                self.get_detector().get_params(),
+                rotate=self.rotate,
+                v_flip=self.v_flip,
+                h_flip=self.h_flip,
+                reorient_corners=self.reorient_corners,
+                sharpness=self.get_gate().get_params() if self.sharpness_filter else None,
+            ),
+            self.cache_dir,
+        )
+
+    def choose_engine(self):
+        frames = load_sample_frames(self.video_filename, self.sample_rate, video_backend=self.video_backend)
+        results = benchmark_detectors(frames, self.nx, self.ny, criteria=self.criteria, scale=self.detection_scale)
+        engine = choose_detector(results)
+        self.progress((0, None, f"Detector benchmark: {summarize(results)}; using {engine}"))
+        return engine
+
+    def get_gate(self):
+        if not self.sharpness_filter:
+            return None
+        return SharpnessGate(self.sharpness_fraction)
+
+    def calibrate_gate(self, gate, total_frames):
+        '''
+        Sets the sharpness threshold from frames spread over the whole
+        video. They do not depend on the sample rate, so a rerun at another
+        rate skips the cached frames alike.
+        '''
+        if total_frames > 0:
+            frame_indices = sorted(itertools.islice(bisection_order(range(1, total_frames + 1)), gate.samples))
+        else:
+            frame_indices = range(1, gate.samples + 1)
+        reader = open_reader(self.video_filename, self.video_backend, gray=True)
+        gate.calibrate(frame for _, frame in FrameSampler(reader, frame_indices, self.sampling))
+
+    def get_detector(self):
+        detector = make_detector(self.engine, self.nx, self.ny, self.criteria, self.detection_scale)
+        if self.tracking:
+            return CornerTracker(detector)
+        return detector
+
+    def detect_chessboard(self, reader, frame_indices, gate=None):
+        detector = self.get_detector()
+        self.sampler = FrameSampler(reader, frame_indices, self.sampling)
+        # A tracker follows the board frame to frame and needs frames in order.
+        detect_threads = 1 if self.tracking else self.detect_threads
+        self.pipeline = DetectionPipeline(self.queue_depth, detect_threads)
+        detect = lambda nth_frame, frame: (nth_frame,) + detect_oriented(
+            detector,
+            self.reorienter,
+            frame,
+            self.reorient_corners,
+            gate,
+        )
+        try:
+            for nth_frame, frame, shape, corners, score in self.pipeline.run(self.sampler, detect):
+                self.shape = shape
+                yield nth_frame, frame, corners, score
+        finally:
+            self.stage_utilization = self.pipeline.utilization()
+            self.skipped = gate.skipped if gate is not None else 0
+            self.missed = self.sampler.stats["missed"]
+            if self.tracking:
+                self.progress((100, None, "Tracked {tracked} frames, searched {searched}, lost track {lost} times".format(**detector.stats)))
+
+    def detect_chessboard_parallel(self, frame_indices, gate=None):
+        pool = DetectionPool(self.workers)
+        detections = pool.detect(
+            self.video_filename,
+            frame_indices,
+            self.get_detector(),
+            self.rotate,
+            self.v_flip,
+            self.h_flip,
+            self.sampling,
+            self.reorient_corners,
+            self.video_backend,
+            gate,
+        )
+        try:
+            for shape, nth_frame, corners, score in detections:
+                self.shape = shape
+                yield nth_frame, None, corners, score
+        finally:
+            self.skipped = pool.skipped
+            self.missed = pool.missed
+
+    def calc_intrinsics(self, dataset):
+        h, w = dataset.shape
+        dataset.mtx = cv2.initCameraMatrix2D(dataset.objpoints(), dataset.imgpoints(), (w, h))
+        dataset.rvecs, dataset.tvecs, fallback = estimate_poses(
+            dataset.objp,
+            dataset.points,
+            dataset.mtx,
+            refine=self.refine_poses,
+        )
+        return fallback
+
+    def calc_distorted_intrinsics(self, dataset):
+        h, w = dataset.shape
+        # calibrateCamera gets superlinearly slower with the view count while
+        # near-duplicate views add nothing, so solve on a diverse subset.
+        kept = select_views(dataset.points, dataset.shape, self.nx, self.ny, self.max_views)
+        dataset.calibration_frames = dataset.frames[kept].tolist()
+        self.progress((0, None, f"Solving with {len(kept)} of {len(dataset)} views"))
+        ret, mtx, dist, rvecs, tvecs = cv2.calibrateCamera(
+            dataset.objpoints(len(kept)),
+            dataset.imgpoints(kept),
+            (w, h),
+            None,
+            None,
+        )
+        if ret:
+            dataset.rms = ret
+            dataset.rvecs = rvecs
+            dataset.tvecs = tvecs
+            dataset.dist = dist
+            dataset.mtx = mtx
+        else:
+            raise Exception("Calibration failed")
+
+    def get_views(self, detections):
+        '''
+        Frames whose detections are used as calibration views: those at the
+        current sample rate, minus near duplicates when min_motion is set.
+        '''
+        self.duplicate_filter = DuplicateFilter(self.min_motion) if self.min_motion else None
+        views = set()
+        for nth_frame in sorted(detections):
+            if nth_frame % self.sample_rate != 0:
+                continue
+            if self.duplicate_filter is None or self.duplicate_filter.accept(detections[nth_frame]):
+                views.add(nth_frame)
+        return views
+
+    def get_monitor(self, detections, views):
+        monitor = CoverageMonitor(self.nx, self.ny, self.min_views, self.min_coverage, self.min_poses)
+        for nth_frame in views:
+            monitor.add(detections[nth_frame], self.shape)
+        return monitor
+
+    def get_estimator(self, objp, detections, views):
+        if not self.estimate_interval:
+            return None
+        estimator = OnlineEstimator(
+            objp,
+            self.nx,
+            self.ny,
+            self.estimate,
+            self.distorted,
+            self.estimate_views,
+            interval=self.estimate_interval,
+        )
+        for nth_frame in sorted(views):
+            estimator.add(nth_frame, detections[nth_frame], self.shape)
+        return estimator
+
+    def collect_detections(self, analyzed, detections, scores, views, estimator=None):
+        # Detection only needs luminance, so let a backend that can skip the
+        # colour conversion do so.
+        self.reader = open_reader(self.video_filename, self.video_backend, gray=True)
+        total_frames = self.reader.frame_count()
+        # Frames searched by an earlier run, at this or any other sample
+        # rate, are not decoded again.
+        frame_indices = (
+            nth_frame
+            for nth_frame in sample_indices(total_frames, self.sample_rate)
+            if nth_frame not in analyzed
+        )
+        planned = None
+        if total_frames > 0:
+            frame_indices = list(frame_indices)
+            planned = len(frame_indices)
+            # Visit the video coarse to fine so that stopping early still
+            # leaves views from all of it. Without a frame count there is no
+            # middle to start from, so such videos are read in order.
+            if self.anytime:
+                frame_indices = list(bisection_order(frame_indices))
+        monitor = self.get_monitor(detections, views) if self.anytime else None
+        self.stop_reason = None
+        if monitor is not None and monitor.satisfied():
+            self.stop_reason = f"Nothing searched, cached detections already give {monitor.summary()}"
+            return
+        gate = self.get_gate()
+        if gate is not None:
+            self.calibrate_gate(gate, total_frames)
+        if self.workers > 1 and total_frames > 0:
+            results = self.detect_chessboard_parallel(frame_indices, gate)
+        else:
+            results = self.detect_chessboard(self.reader, frame_indices, gate)
+        throttle = PreviewThrottle(self.preview_fps)
+        searched = 0
+        next_checkpoint = time.monotonic() + self.checkpoint_interval
+        for idx, frame, corners, score in results:
+            analyzed.add(idx)
+            searched += 1
+            if score is not None:
+                scores[idx] = score
+            # Every detection is cached, so a later run with another
+            # min_motion can still use the ones suppressed here.
+            if corners is not None:
+                detections[idx] = corners
+            if self.stop_requested.is_set():
+                # Frames left unsearched are searched on resume.
+                self.cancelled = True
+                self.stop_reason = f"Cancelled after {searched} of {planned or 'all'} frames"
+                results.close()
+                break
+            new_view = corners is not None and (self.duplicate_filter is None or self.duplicate_filter.accept(corners))
+            if new_view:
+                views.add(idx)
+                if estimator is not None:
+                    estimator.add(idx, corners, self.shape)
+                if monitor is not None:
+                    monitor.add(corners, self.shape)
+                    if monitor.satisfied():
+                        # Frames left unsearched stay out of the analyzed
+                        # set, so a later run picks up where this one ended.
+                        self.stop_reason = f"Stopped after {searched} of {planned} frames with {monitor.summary()}"
+                        results.close()
+                        break
+            if self.checkpoint_interval and time.monotonic() >= next_checkpoint:
+                self.checkpoint(analyzed, detections, scores)
+                next_checkpoint = time.monotonic() + self.checkpoint_interval
+            if not throttle.ready():
+                continue
+            # Only a thumbnail crosses to the GUI thread, and the overlay is
+            # drawn onto that rather than onto a copy of the full frame.
+            thumbnail = None
+            if frame is not None:
+                thumbnail, scale = make_thumbnail(frame)
+                if thumbnail.ndim == 2:
+                    thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_GRAY2BGR)
+                if self.reorient_corners:
+                    thumbnail = self.reorient(thumbnail)
+                if corners is not None:
+                    thumbnail = self.draw_chessboard(thumbnail, corners * scale, copy=thumbnail is frame)
+            msg = "Detecting calibration board"
+            if score is not None:
+                msg += f" (sharpness {score:.0f})"
+            self.progress((
+                min(int(100 * searched / planned), 100) if planned else 0,
+                thumbnail,
+                msg,
+            ))
+        if monitor is not None and self.stop_reason is None:
+            self.stop_reason = f"Searched every sampled frame, stopping criteria not met: {monitor.summary()}"
+        if self.missed:
+            # They stay out of the analyzed set, so a later run tries them again.
+            self.progress((100, None, f"Could not seek to {self.missed} frames"))
+        if self.sharpness_filter:
+            self.progress((100, None, f"Skipped {self.skipped} blurred frames"))
+        if self.duplicate_filter is not None:
+            self.progress((100, None, f"Suppressed {self.duplicate_filter.suppressed} near-duplicate views"))
+        if self.stage_utilization:
+            usage = ", ".join(f"{stage} {100 * value:.0f}%" for stage, value in self.stage_utilization.items())
+            self.progress((100, None, f"Stage utilization: {usage}"))
+
+    def run(self):
+        if self.anytime and self.tracking:
+            # Frames visited coarse to fine are far apart, so a tracker would
+            # lose the board every time and search in full anyway.
+            self.tracking = False
+            self.progress((0, None, "Corner tracking is off in anytime mode"))
+        if self.engine is None:
+            self.engine = self.choose_engine()
+
+        self.shape = None
+        analyzed = set()
+        detections = {}
+        scores = {}
+
+        self.cache = self.get_cache()
+        cached = self.cache.load() if self.cache is not None else None
+        if cached is not None:
+            self.shape, analyzed, detections, scores = cached
+            self.progress((0, None, f"Reusing {len(analyzed)} previously searched frames"))
+        self.checkpointed = len(analyzed)
+        views = self.get_views(detections)
+        estimator = self.get_estimator(self.objp, detections, views)
+        if estimator is not None:
+            estimator.start()
+        try:
+            self.collect_detections(analyzed, detections, scores, views, estimator)
+        finally:
+            if estimator is not None:
+                estimator.stop()
+            # Also on failure, so a crashed run keeps what it searched.
+            self.checkpoint(analyzed, detections, scores)
+        if self.stop_reason is not None:
+            self.progress((100, None, self.stop_reason))
+        if self.cancelled:
+            return
+
+        dataset = CalibrationDataset(self.objp, len(views))
+        for nth_frame in sorted(views):
+            dataset.append(nth_frame, detections[nth_frame])
+        dataset.shape = self.shape
+        dataset.sharpness = scores
+        dataset.detections = detections
+        self.dataset = dataset
+
+        if not len(dataset):
+            raise Exception("Insufficient frames")
+
+        self.progress((0, None, "Computing intrinsic properties"))
+        if self.distorted:
+            self.calc_distorted_intrinsics(dataset)
+            self.progress((100, None, "Estimation complete"))
+        else:
+            self.progress((0, None, "Calculating pose"))
+            fallback = self.calc_intrinsics(dataset)
+            self.progress((
+                100,
+                None,
+                f"Estimation complete ({len(fallback)} views needed RANSAC)",
+            ))
@@ -0,0 +1,94 @@
+import heapq
+import itertools
+import os
+
+import cv2
+
+# A camera's own Calibrate button goes ahead of cameras queued by
+# "Calibrate Cameras".
+INTERACTIVE = 0
+BATCH = 1
+
+class CalibrationScheduler:
+    '''
+    Runs the calibrations of a CameraList within a budget of worker cores.
+
+    Widgets are queued by priority, then in the order they were submitted.
+    Submitting a queued widget again at a higher priority moves it up.
+    A job costs as many cores as the detection workers its camera settings
+    ask for. The next job starts only once the jobs already running leave
+    enough of the budget for it, though a job larger than the whole budget
+    still runs alone. OpenCV's internal thread pool is shared by every
+    running job, so it is resized to an even share of the budget whenever
+    a job starts or finishes.
+
+    A widget taking part provides calibration_cost(), calibration_queued()
+    and start_calibration(), and calls job_finished() once its calibration
+    thread has finished.
+    '''
+    def __init__(self, budget=None):
+        self.budget = budget or os.cpu_count() or 1
+        self.queue = []
+        self.order = itertools.count()
+        self.running = {}
+
+    def set_budget(self, budget):
+        self.budget = max(budget, 1)
+        self.dispatch()
+
+    def queued_priority(self, widget):
+        return next((priority for priority, _, queued in self.queue if queued is widget), None)
+
+    def submit(self, widget, priority=INTERACTIVE):
+        if widget in self.running:
+            return
+        queued = self.queued_priority(widget)
+        if queued is not None:
+            if queued <= priority:
+                return
+            self.cancel(widget)
+        heapq.heappush(self.queue, (priority, next(self.order), widget))
+        widget.calibration_queued()
+        self.dispatch()
+
+    def cancel(self, widget):
+        '''
+        Takes a widget off the queue. Returns whether it was queued.
+        '''
+        queue = [job for job in self.queue if job[2] is not widget]
+        if len(queue) == len(self.queue):
+            return False
+        heapq.heapify(queue)
+        self.queue = queue
+        return True
+
+    def dispatch(self):
+        '''
+        Starts queued jobs while the budget allows. A job whose start raises
+        is dropped without holding any of the budget, the jobs after it
+        still start, and the first such error is raised at the end.
+        '''
+        error = None
+        while self.queue:
+            widget = self.queue[0][2]
+            cost = widget.calibration_cost()
+            if self.running and sum(self.running.values()) + cost > self.budget:
+                break
+            heapq.heappop(self.queue)
+            self.running[widget] = cost
+            try:
+                widget.start_calibration()
+            except Exception as start_error:
+                # No thread will finish to hand the cores back.
+                del self.running[widget]
+                error = error or start_error
+        self.set_threads()
+        if error is not None:
+            raise error
+
+    def job_finished(self, widget):
+        self.running.pop(widget, None)
+        self.dispatch()
+
+    def set_threads(self):
+        cv2.setNumThreads(max(self.budget // max(len(self.running), 1), 1))
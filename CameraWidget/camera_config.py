@@ -2,11 +2,13 @@
 from PySide6.QtCore import Signal, Qt
 from PySide6.QtWidgets import *
 from PySide6.QtSvgWidgets import QSvgWidget
-from PySide6.QtGui import QIntValidator, QImage, QPixmap
+from PySide6.QtGui import QDoubleValidator, QIntValidator, QImage, QPixmap
 
 import cv2
 
 from CameraWidget.calibrate_camera import CameraCalibration
+from CameraWidget.detection import DETECTORS, MIN_SCALE
+from CameraWidget.view_selection import MIN_VIEWS
 
 from CameraWidget.frame_painter import *
 
@@ -47,6 +49,8 @@ class CameraConfig(QWidget):
         self.hflip_input.checkStateChanged.connect(self.update_frame)
         orient_layout.addWidget(self.vflip_input)
         orient_layout.addWidget(self.hflip_input)
+        self.reorient_corners_input = QCheckBox("reorient detected corners only")
+        orient_layout.addWidget(self.reorient_corners_input)
 
         extras_layout = QHBoxLayout()
         extras_layout.addWidget(QLabel("Calibration sample rate:"))
@@ -55,6 +59,36 @@ class CameraConfig(QWidget):
         onlyInt.setRange(1, 999)
         self.sample_rate.setValidator(onlyInt)
         extras_layout.addWidget(self.sample_rate)
+        extras_layout.addWidget(QLabel("Detection processes:"))
+        self.workers_input = QLineEdit()
+        workersInt = QIntValidator()
+        workersInt.setRange(1, 256)
+        self.workers_input.setValidator(workersInt)
+        extras_layout.addWidget(self.workers_input)
+        extras_layout.addWidget(QLabel("Coarse search scale:"))
+        self.detection_scale_input = QLineEdit()
+        self.detection_scale_input.setValidator(QDoubleValidator(MIN_SCALE, 1.0, 2))
+        extras_layout.addWidget(self.detection_scale_input)
+        extras_layout.addWidget(QLabel("Max calibration views:"))
+        self.max_views_input = QLineEdit()
+        viewsInt = QIntValidator()
+        viewsInt.setRange(MIN_VIEWS, 9999)
+        self.max_views_input.setValidator(viewsInt)
+        extras_layout.addWidget(self.max_views_input)
+        extras_layout.addWidget(QLabel("Min view motion (px):"))
+        self.min_motion_input = QLineEdit()
+        self.min_motion_input.setValidator(QDoubleValidator(0.0, 1000.0, 2))
+        extras_layout.addWidget(self.min_motion_input)
+        extras_layout.addWidget(QLabel("Detector:"))
+        self.detector_input = QComboBox()
+        self.detector_input.addItems(list(DETECTORS) + ["auto"])
+        extras_layout.addWidget(self.detector_input)
+        self.sharpness_input = QCheckBox("Skip blurred frames")
+        extras_layout.addWidget(self.sharpness_input)
+        self.tracking_input = QCheckBox("Track corners between frames")
+        extras_layout.addWidget(self.tracking_input)
+        self.anytime_input = QCheckBox("Stop once coverage is sufficient")
+        extras_layout.addWidget(self.anytime_input)
         self.distortion_input = QCheckBox("Fisheye Camera")
         extras_layout.addWidget(self.distortion_input)
 
@@ -82,6 +116,14 @@ class CameraConfig(QWidget):
         self.rotation_input.setText(str(config['rotation']))
         self.video_file = config['video_file']
         self.sample_rate.setText(str(config['sample_rate']))
+        self.workers_input.setText(str(config['workers']))
+        self.detection_scale_input.setText(str(config['detection_scale']))
+        self.max_views_input.setText(str(config['max_views']))
+        self.min_motion_input.setText(str(config['min_motion']))
+        self.detector_input.setCurrentText(config['detector'])
+        self.sharpness_input.setCheckState(get_check_state(config['sharpness_filter']))
+        self.tracking_input.setCheckState(get_check_state(config['tracking']))
+        self.anytime_input.setCheckState(get_check_state(config['anytime']))
         self.distortion_input.setCheckState(get_check_state(config['distorted']))
         if self.video_file:
             self.file_label.setText(config['video_file'])
@@ -89,6 +131,7 @@ class CameraConfig(QWidget):
             self.file_label.setText("Missing calibration video file")
         self.vflip_input.setCheckState(get_check_state(config['v_flip']))
         self.hflip_input.setCheckState(get_check_state(config['h_flip']))
+        self.reorient_corners_input.setCheckState(get_check_state(config['reorient_corners']))
 
     def get_config(self):
         name = self.camera_name.text().strip()
@@ -98,14 +141,42 @@ class CameraConfig(QWidget):
         except ValueError:
             rotation = 0
 
+        # The validator still lets through text it deems intermediate, such
+        # as 0, so the value is clamped to its range here.
+        try:
+            detection_scale = min(max(float(self.detection_scale_input.text()), MIN_SCALE), 1.0)
+        except ValueError:
+            detection_scale = 1.0
+
+        # As few views as 0 would leave calibrateCamera nothing to solve
+        # with, so the limit is at least MIN_VIEWS.
+        try:
+            max_views = max(int(self.max_views_input.text()), MIN_VIEWS)
+        except ValueError:
+            max_views = 60
+
+        try:
+            min_motion = max(float(self.min_motion_input.text()), 0.0)
+        except ValueError:
+            min_motion = 2.0
+
         return {
             "name": name,
             "rotation": rotation,
             "v_flip": self.vflip_input.checkState() == Qt.CheckState.Checked,
             "h_flip": self.hflip_input.checkState() == Qt.CheckState.Checked,
+            "reorient_corners": self.reorient_corners_input.checkState() == Qt.CheckState.Checked,
             "distorted": self.distortion_input.checkState() == Qt.CheckState.Checked,
             "video_file": self.video_file,
             "sample_rate": int(self.sample_rate.text()),
+            "workers": int(self.workers_input.text() or 1),
+            "detection_scale": detection_scale,
+            "max_views": max_views,
+            "min_motion": min_motion,
+            "detector": self.detector_input.currentText(),
+            "sharpness_filter": self.sharpness_input.checkState() == Qt.CheckState.Checked,
+            "tracking": self.tracking_input.checkState() == Qt.CheckState.Checked,
+            "anytime": self.anytime_input.checkState() == Qt.CheckState.Checked,
         }
 
     def open_file_chooser(self):
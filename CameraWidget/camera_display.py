@@ -8,10 +8,12 @@ import cv2
 
 from CameraWidget.calibrate_camera import CameraCalibration
 from CameraWidget.frame_painter import *
+from CameraWidget.undistort import undistort_thumbnail
 
 class CameraDisplay(QWidget):
     request_edit = Signal(bool)
     start_calibration = Signal(bool)
+    cancel_calibration = Signal(bool)
     delete = Signal(bool)
     calibrated = Signal(tuple)
     def __init__(self, config):
@@ -51,10 +53,23 @@ class CameraDisplay(QWidget):
 
         self.calib_msg = QLabel("Not calibrated")
         layout.addWidget(self.calib_msg)
+        # What the last calibration run reported besides its progress: stop
+        # reasons, frames skipped or suppressed, the detector chosen.
+        self.status_msg = QLabel()
+        self.status_msg.setWordWrap(True)
+        layout.addWidget(self.status_msg)
+        self.status_lines = []
 
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
-        self.calib_stack.addWidget(self.progress_bar)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.pressed.connect(lambda: self.cancel_calibration.emit(True))
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_btn)
+        progress_widget = QWidget()
+        progress_widget.setLayout(progress_layout)
+        self.calib_stack.addWidget(progress_widget)
 
         layout.addLayout(self.calib_stack)
 
@@ -78,8 +93,39 @@ class CameraDisplay(QWidget):
             self.video_path.setText("Missing calibration video file")
             self.calib_btn.setEnabled(False)
 
+    def show_undistorted(self, config, calibration):
+        '''
+        Paints the first frame undistorted by a calibration that solved for
+        lens distortion. Only the thumbnail is undistorted, so this stays
+        cheap enough for the GUI thread whatever the video's resolution.
+        '''
+        frame_data = get_first_frame(
+            config['video_file'],
+            config['rotation'],
+            config['v_flip'],
+            config['h_flip'],
+        )
+        paint_frame(self.calib_frame, undistort_thumbnail(frame_data, calibration.mtx, calibration.dist))
+
+    def clear_status(self):
+        self.status_lines = []
+        self.status_msg.clear()
+        self.progress_bar.resetFormat()
+
     def update_calibrate_progress(self, args):
         progress, frame, msg = args
         self.progress_bar.setValue(progress)
+        if msg.startswith("Detecting calibration board"):
+            self.progress_bar.setFormat(f"{msg}: %p%")
+        elif msg:
+            self.progress_bar.resetFormat()
+            self.status_lines.append(msg)
+            self.status_msg.setText("\n".join(self.status_lines))
         if frame is not None:
             paint_frame(self.calib_frame, frame)
+
+    def update_estimate(self, args):
+        views, mtx, dist, rms = args
+        self.calib_msg.setText(
+            f"Estimate from {views} views: focal length {mtx[0][0]:.0f} px, reprojection error {rms:.2f} px"
+        )
@@ -9,25 +9,9 @@ import cv2
 from CameraWidget.camera_display import CameraDisplay
 from CameraWidget.camera_config import CameraConfig
 from CameraWidget.calibrate_camera import CameraCalibration
-
-def reorient(frame, rotate=0, v_flip=False, h_flip=False):
-    if rotate % 360:
-        height, width = frame.shape[:2]
-        rotation_matrix = cv2.getRotationMatrix2D(
-            (width // 2, height // 2),
-            rotate,
-            1.0,
-        )
-        frame = cv2.warpAffine(
-            frame,
-            rotation_matrix,
-            (width, height),
-        )
-    if v_flip:
-        frame = cv2.flip(frame, 0)
-    if h_flip:
-        frame = cv2.flip(frame, 1)
-    return frame
+from CameraWidget.calibrate_rig import RigCalibrationThread
+from CameraWidget.calibration_scheduler import BATCH, INTERACTIVE, CalibrationScheduler
+from CameraWidget.reorient import reorient
 
 def get_first_frame(filename, rotate=0, v_flip=False, h_flip=False):
     video = cv2.VideoCapture(filename)
@@ -56,12 +40,15 @@ class CameraWidget(QWidget):
         self.id = cam_id
 
         self.calibration = False
+        self.cc = None
+        self.scheduler = None
         self.config = {}
         self.stack_layout = QStackedLayout()
 
         self.camera_display = CameraDisplay(config)
         self.camera_display.request_edit.connect(self.toggle_config)
-        self.camera_display.start_calibration.connect(self.calibrate)
+        self.camera_display.start_calibration.connect(lambda: self.calibrate())
+        self.camera_display.cancel_calibration.connect(lambda: self.cancel_calibration())
         self.camera_display.calibrated.connect(self.update_calibration)
         self.camera_display.delete.connect(lambda: self.delete.emit(self.id))
         self.camera_config = CameraConfig(config)
@@ -76,6 +63,9 @@ class CameraWidget(QWidget):
     def set_board_config(self, config):
         self.board_config = config
 
+    def set_scheduler(self, scheduler):
+        self.scheduler = scheduler
+
     def update_calibration(self, calib):
         self.calibration = calib
 
@@ -95,14 +85,44 @@ class CameraWidget(QWidget):
             self.config = config
             self.camera_display.update(self.config)
             self.camera_display.calib_msg.setText("Not calibrated")
+            self.camera_display.clear_status()
         self.updated.emit(config)
         self.toggle_display()
 
     def get_config(self):
         return self.camera_config.get_config()
 
-    def calibrate(self):
+    def calibrate(self, priority=INTERACTIVE):
+        if self.scheduler is None:
+            self.start_calibration()
+        else:
+            self.scheduler.submit(self, priority)
+
+    def calibration_cost(self):
+        return max(self.get_config()['workers'], 1)
+
+    def calibration_queued(self):
+        self.camera_display.clear_status()
+        self.camera_display.calib_msg.setText("Queued for calibration")
+        self.camera_display.progress_bar.setValue(0)
+        self.camera_display.cancel_btn.setEnabled(True)
+        self.camera_display.calib_stack.setCurrentIndex(1)
+
+    def start_calibration(self):
         self.camera_display.calib_msg.clear()
+        self.camera_display.clear_status()
+        try:
+            self.create_calibration()
+        except Exception as error:
+            self.cc = None
+            self.camera_display.calib_stack.setCurrentIndex(0)
+            self.camera_display.calib_msg.setText(f"Calibration could not start: {error}")
+            raise
+        self.camera_display.cancel_btn.setEnabled(True)
+        self.camera_display.calib_stack.setCurrentIndex(1)
+        self.cc.start()
+
+    def create_calibration(self):
         camera_config = self.get_config()
         self.cc = CameraCalibration(
             camera_config['video_file'],
@@ -113,29 +133,72 @@ class CameraWidget(QWidget):
             camera_config['h_flip'],
             camera_config['sample_rate'],
             camera_config['distorted'],
+            workers=camera_config['workers'],
+            detection_scale=camera_config['detection_scale'],
+            max_views=camera_config['max_views'],
+            min_motion=camera_config['min_motion'],
+            reorient_corners=camera_config['reorient_corners'],
+            tracking=camera_config['tracking'],
+            anytime=camera_config['anytime'],
+            detector_engine=camera_config['detector'],
+            sharpness_filter=camera_config['sharpness_filter'],
         )
-        self.camera_display.calib_stack.setCurrentIndex(1)
+        # Owned by the widget rather than by self.cc, which done_calibrating
+        # clears while finished is still being delivered.
+        self.cc.setParent(self)
         self.cc.progress.connect(self.camera_display.update_calibrate_progress)
+        self.cc.estimate.connect(self.camera_display.update_estimate)
         self.cc.finished.connect(self.done_calibrating)
         self.cc.finished.connect(self.cc.deleteLater)
-        self.cc.start()
+
+    def cancel_calibration(self, wait=False):
+        '''
+        Takes a queued calibration off the queue, or asks a running one to
+        stop. A running one saves the frames searched so far, and
+        calibrating again with the same settings resumes from them.
+        '''
+        if self.scheduler is not None and self.scheduler.cancel(self):
+            self.camera_display.calib_stack.setCurrentIndex(0)
+            self.camera_display.calib_msg.setText("Calibration cancelled")
+            return
+        if self.cc is None:
+            return
+        self.camera_display.cancel_btn.setEnabled(False)
+        self.cc.cancel()
+        if wait:
+            self.cc.wait()
 
     def done_calibrating(self):
         self.camera_display.calib_stack.setCurrentIndex(0)
-        self.calibration = self.cc.get_calibration()
-        frames = len(self.calibration['frames_with_corners'])
-        if self.calibration['mtx'] is not None:
+        cancelled = self.cc.cancelled
+        calibration = self.cc.get_calibration()
+        self.cc = None
+        if self.scheduler is not None:
+            self.scheduler.job_finished(self)
+        if cancelled:
+            self.camera_display.calib_msg.setText("Calibration cancelled, progress saved")
+            return
+        self.calibration = calibration
+        frames = len(self.calibration)
+        if self.calibration.mtx is not None:
             self.camera_display.calib_msg.setText(f"Calibration successful with {frames} frames")
+            if self.calibration.dist is not None:
+                self.camera_display.show_undistorted(self.get_config(), self.calibration)
         else:
             self.camera_display.calib_msg.setText(f"Calibration failed with {frames} frames")
         #self.camera_display.calib_frame.clear()
         #self.calibrated.emit((mtx, dist))
 
 class CameraList(QWidget):
-    def __init__(self):
+    rig_running = Signal(bool)
+    def __init__(self, budget=None):
         super().__init__()
 
         self.camera_list = []
+        self.scheduler = CalibrationScheduler(budget)
+        self.rig = None
+        self.rig_thread = None
+        self.rig_cameras = []
 
         layout = QVBoxLayout()
 
@@ -152,6 +215,9 @@ class CameraList(QWidget):
         scroll_area.setWidget(scroll_widget)
         layout.addWidget(scroll_area)
 
+        self.rig_msg = QLabel("Rig not calibrated")
+        layout.addWidget(self.rig_msg)
+
         self.setLayout(layout)
 
         self.add_camera()
@@ -175,10 +241,22 @@ class CameraList(QWidget):
             "rotation": 0,
             "v_flip": False,
             "h_flip": False,
+            "reorient_corners": False,
             "distorted": False,
             "video_file": '',
             "sample_rate": 1,
+            "workers": 1,
+            "detection_scale": 1.0,
+            "max_views": 60,
+            "min_motion": 2.0,
+            "detector": "classic",
+            "sharpness_filter": False,
+            "tracking": False,
+            "anytime": False,
         })
+        camera_widget.set_scheduler(self.scheduler)
+        if hasattr(self, "board_config"):
+            camera_widget.set_board_config(self.board_config)
         self.camera_list.append(camera_widget)
         camera_widget.delete.connect(self.delete_camera)
         self.scroll_area_layout.addWidget(camera_widget)
@@ -187,8 +265,70 @@ class CameraList(QWidget):
         idx = next(idx for idx, cam in enumerate(self.camera_list) if cam.id == cam_id)
         cam = self.scroll_area_layout.takeAt(idx)
         self.camera_list.pop(idx)
+        cam.widget().cancel_calibration(wait=True)
         cam.widget().deleteLater()
 
+    def calibrate_all(self):
+        for widget in self.camera_list:
+            if widget.get_config()['video_file']:
+                widget.calibrate(BATCH)
+
+    def calibrate_rig(self):
+        '''
+        Solves the camera-to-camera poses from the detections each camera's
+        calibration kept, relative to the first calibrated camera, then
+        bundle adjusts the intrinsics and poses of the whole rig together,
+        on a RigCalibrationThread. Frames are matched by number, so the
+        videos must start in sync.
+        '''
+        if self.rig_thread is not None:
+            return
+        cameras = [
+            widget for widget in self.camera_list
+            if widget.calibration is not False and widget.calibration.mtx is not None
+        ]
+        if len(cameras) < 2:
+            self.rig_msg.setText("Calibrate at least two cameras first")
+            return
+        self.rig_cameras = cameras
+        self.rig_thread = RigCalibrationThread(
+            [widget.calibration for widget in cameras],
+            self.board_config['nx'],
+            self.board_config['ny'],
+        )
+        self.rig_thread.setParent(self)
+        self.rig_thread.progress.connect(self.rig_msg.setText)
+        self.rig_thread.finished.connect(self.done_calibrating_rig)
+        self.rig_thread.finished.connect(self.rig_thread.deleteLater)
+        self.rig_msg.setText("Calibrating rig")
+        self.rig_running.emit(True)
+        self.rig_thread.start()
+
+    def done_calibrating_rig(self):
+        rig, initial = self.rig_thread.rig, self.rig_thread.initial_rms
+        cameras = self.rig_cameras
+        self.rig_thread = None
+        self.rig_cameras = []
+        self.rig_running.emit(False)
+        if rig is None:
+            self.rig_msg.setText("Rig calibration failed")
+            return
+        self.rig = rig
+        placed = rig.connected()
+        if len(placed) < 2:
+            self.rig_msg.setText("No two cameras saw the board in enough of the same frames")
+            return
+        names = ", ".join(cameras[camera].get_config()['name'] for camera in placed)
+        self.rig_msg.setText(
+            f"Rig calibrated from {len(rig.observations)} frames ({names}), reprojection error {rig.rms:.2f} px ({initial:.2f} px before bundle adjustment)"
+        )
+
+    def cancel_calibrations(self):
+        for widget in self.camera_list:
+            widget.cancel_calibration(wait=True)
+        if self.rig_thread is not None:
+            self.rig_thread.wait()
+
     def set_board_params(self, board_config):
         self.board_config = board_config
         for widget in self.camera_list:
@@ -0,0 +1,71 @@
+import numpy as np
+
+class CalibrationDataset:
+    '''
+    The views of one camera calibration and the solution found from them.
+
+    Corners are kept in a single contiguous float32 (views, corners, 2)
+    array with a parallel int64 array of frame numbers. Both are
+    preallocated and double in capacity when full, so appending a view
+    costs no allocation most of the time. Every view shares the one
+    (corners, 3) object point template.
+
+    points and frames are views of the filled part of those arrays.
+    imgpoints() and objpoints() return the per-view lists OpenCV's
+    calibration functions take, made of views rather than copies. A view
+    taken before an append that grows the arrays keeps pointing at the old
+    buffer. That buffer is still valid, but later views are not in it.
+
+    detections keeps the corners of every frame the board was found in,
+    views or not, so that other cameras' frames can be matched against
+    them later.
+    '''
+    def __init__(self, objp, capacity=64):
+        self.objp = np.ascontiguousarray(objp, dtype=np.float32).reshape(-1, 3)
+        self._points = np.empty((max(capacity, 1), len(self.objp), 2), np.float32)
+        self._frames = np.empty(max(capacity, 1), np.int64)
+        self.size = 0
+        self.shape = None
+        self.mtx = None
+        self.dist = None
+        self.rvecs = None
+        self.tvecs = None
+        self.rms = None
+        self.calibration_frames = []
+        self.sharpness = {}
+        self.detections = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def points(self):
+        return self._points[:self.size]
+
+    @property
+    def frames(self):
+        return self._frames[:self.size]
+
+    def reserve(self, capacity):
+        if capacity <= len(self._frames):
+            return
+        points = np.empty((capacity,) + self._points.shape[1:], np.float32)
+        frames = np.empty(capacity, np.int64)
+        points[:self.size] = self.points
+        frames[:self.size] = self.frames
+        self._points, self._frames = points, frames
+
+    def append(self, nth_frame, corners):
+        if self.size == len(self._frames):
+            self.reserve(2 * self.size)
+        self._points[self.size] = corners.reshape(-1, 2)
+        self._frames[self.size] = nth_frame
+        self.size += 1
+
+    def imgpoints(self, indices=None):
+        if indices is None:
+            indices = range(self.size)
+        return [self._points[i].reshape(-1, 1, 2) for i in indices]
+
+    def objpoints(self, count=None):
+        return [self.objp] * (self.size if count is None else count)
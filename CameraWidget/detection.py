@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+
+CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+SUBPIX_WINDOW = (11, 11)
+
+# Smallest coarse search scale offered. Below it a board that fills less
+# than the whole frame is too few pixels across to be found.
+MIN_SCALE = 0.05
+
+class ChessboardDetector:
+    '''
+    Finds and refines the interior corners of a chessboard in a grayscale
+    frame with findChessboardCorners and cornerSubPix.
+
+    With a scale below 1 the board is first searched for in a downscaled
+    copy of the frame. Frames without a board are rejected there, and when a
+    board is found only the region around it is refined at full resolution.
+    '''
+    name = "classic"
+
+    def __init__(self, nx, ny, criteria=CRITERIA, scale=1.0):
+        self.chessboard_dims = (nx, ny)
+        self.criteria = criteria
+        self.scale = scale
+
+    def get_params(self):
+        nx, ny = self.chessboard_dims
+        return {"nx": nx, "ny": ny, "scale": self.scale, "engine": self.name}
+
+    def find(self, gray):
+        return cv2.findChessboardCorners(gray, self.chessboard_dims)
+
+    def refine(self, gray, corners):
+        return cv2.cornerSubPix(gray, corners, SUBPIX_WINDOW, (-1,-1), self.criteria)
+
+    def detect(self, gray):
+        if self.scale >= 1.0:
+            corners_found, corners = self.find(gray)
+            if not corners_found:
+                return None
+            return self.refine(gray, corners)
+        return self.detect_coarse_to_fine(gray)
+
+    def detect_coarse_to_fine(self, gray):
+        small = cv2.resize(gray, (0, 0), fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        corners_found, corners = self.find(small)
+        if not corners_found:
+            return None
+        # Pixel centres, not pixel edges, line up between the two levels.
+        corners = (corners + 0.5) / self.scale - 0.5
+        return self.refine_roi(gray, corners)
+
+    def refine_roi(self, gray, corners):
+        height, width = gray.shape[:2]
+        margin = 2 * max(SUBPIX_WINDOW) + int(np.ceil(1 / self.scale))
+        x0, y0 = np.floor(corners.reshape(-1, 2).min(axis=0)).astype(int) - margin
+        x1, y1 = np.ceil(corners.reshape(-1, 2).max(axis=0)).astype(int) + margin
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, width), min(y1, height)
+        roi = np.ascontiguousarray(gray[y0:y1, x0:x1])
+        offset = np.array([x0, y0], dtype=np.float32)
+        corners = np.ascontiguousarray(corners - offset, dtype=np.float32)
+        corners = cv2.cornerSubPix(roi, corners, SUBPIX_WINDOW, (-1,-1), self.criteria)
+        return corners + offset
+
+class SectorDetector(ChessboardDetector):
+    '''
+    Finds the corners with the sector based findChessboardCornersSB, which
+    copes better with blur and noise and already locates them to subpixel
+    accuracy, so at full scale there is no cornerSubPix pass. Corners found
+    in a downscaled frame are still refined at full resolution.
+    '''
+    name = "sb"
+
+    def find(self, gray):
+        return cv2.findChessboardCornersSB(gray, self.chessboard_dims)
+
+    def refine(self, gray, corners):
+        return corners
+
+DETECTORS = {
+    ChessboardDetector.name: ChessboardDetector,
+    SectorDetector.name: SectorDetector,
+}
+
+def make_detector(engine, nx, ny, criteria=CRITERIA, scale=1.0):
+    if engine not in DETECTORS:
+        raise ValueError(f"Unknown detector engine: {engine}")
+    return DETECTORS[engine](nx, ny, criteria, scale)
+
+def to_gray(frame):
+    if frame.ndim == 2:
+        return frame
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+def detect_oriented(detector, reorienter, frame, reorient_corners=False, gate=None):
+    '''
+    Detects the board as it appears after reorientation. The frame may be
+    BGR or already grayscale. Returns the frame that was searched, the
+    reoriented frame shape, the corners in reoriented coordinates and the
+    sharpness score.
+
+    With reorient_corners the search runs on the frame as decoded and only
+    the corner coordinates are transformed, which saves a full-frame warp
+    and, for arbitrary angles, the resampling blur that costs subpixel
+    accuracy.
+
+    A gate (see sharpness.SharpnessGate) scores the frame as decoded
+    first. Frames it rejects are neither reoriented nor searched, and come
+    back without a frame or corners. Without a gate the score is None.
+    '''
+    score = None
+    if gate is not None:
+        accepted, score = gate(frame)
+        if not accepted:
+            return None, reorienter.output_shape(frame.shape), None, score
+    if reorient_corners:
+        corners = detector.detect(to_gray(frame))
+        if corners is not None:
+            corners = reorienter.transform_points(corners, frame.shape)
+            if reorienter.mirrors():
+                # Mirrored, each row's corners come out in the opposite
+                # order to a search of the reoriented frame.
+                nx, ny = detector.chessboard_dims
+                corners = np.ascontiguousarray(corners.reshape(ny, nx, 1, 2)[:, ::-1].reshape(-1, 1, 2))
+        return frame, reorienter.output_shape(frame.shape), corners, score
+    frame = reorienter(frame)
+    return frame, frame.shape[:2], detector.detect(to_gray(frame)), score
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pyStereoMorph", "detections")
+
+# Bytes hashed from each end of the video. Hashing whole multi-gigabyte
+# captures would cost more than decoding them, and size plus mtime plus
+# both ends is enough to notice a replaced or re-encoded file.
+FINGERPRINT_BYTES = 1 << 20
+
+def video_fingerprint(video_filename):
+    stat = os.stat(video_filename)
+    digest = hashlib.sha1()
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(video_filename, "rb") as video_file:
+        digest.update(video_file.read(FINGERPRINT_BYTES))
+        if stat.st_size > FINGERPRINT_BYTES:
+            video_file.seek(max(stat.st_size - FINGERPRINT_BYTES, FINGERPRINT_BYTES))
+            digest.update(video_file.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+class DetectionCache:
+    '''
+    Stores the per-frame chessboard detections of one video on disk so that
+    recalibrating with different solver settings skips detection.
+
+    Entries are keyed by the video fingerprint and every setting that
+    changes which corners are found. The sample rate is deliberately not
+    part of the key: an entry records every frame that was searched,
+    whether or not a board was found, so a run at any sample rate reuses
+    whatever frames earlier runs already covered. Entries are stored as an
+    npz holding the searched frame numbers, the frame numbers with a board,
+    a (views, corners, 2) float32 corner array, the frame shape and the
+    sharpness scores of the frames that were scored.
+    '''
+    def __init__(self, video_filename, params, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        key = dict(params, video=video_fingerprint(video_filename))
+        self.key = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        self.path = os.path.join(cache_dir, f"{self.key}.npz")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with np.load(self.path) as data:
+                analyzed = set(data["analyzed"].tolist())
+                frames = data["frames"].tolist()
+                corners = data["corners"]
+                shape = tuple(data["shape"].tolist())
+                scores = {}
+                if "scores" in data.files:
+                    scores = dict(zip(data["scored_frames"].tolist(), data["scores"].tolist()))
+        except (OSError, KeyError, ValueError):
+            return None
+        detections = {
+            nth_frame: points.reshape(-1, 1, 2)
+            for nth_frame, points in zip(frames, corners)
+        }
+        return shape, analyzed, detections, scores
+
+    def save(self, shape, analyzed, detections, scores=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        frames = sorted(detections)
+        if frames:
+            corners = np.stack([detections[nth_frame].reshape(-1, 2) for nth_frame in frames]).astype(np.float32)
+        else:
+            corners = np.zeros((0, 0, 2), np.float32)
+        scored_frames = sorted(scores or {})
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as cache_file:
+            np.savez(
+                cache_file,
+                analyzed=np.asarray(sorted(analyzed), dtype=np.int64),
+                frames=np.asarray(frames, dtype=np.int64),
+                corners=corners,
+                shape=np.asarray(shape, dtype=np.int64),
+                scored_frames=np.asarray(scored_frames, dtype=np.int64),
+                scores=np.asarray([scores[nth_frame] for nth_frame in scored_frames], dtype=np.float32),
+            )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,96 @@
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from CameraWidget.detection import detect_oriented
+from CameraWidget.frame_sampler import FrameSampler
+from CameraWidget.reorient import get_reorienter
+from CameraWidget.video_reader import open_reader
+
+# Each worker keeps its decoder open between chunks so only the first chunk
+# of a video pays for opening the container.
+_video_readers = {}
+
+def detect_chunk(video_filename, frame_indices, detector, rotate, v_flip, h_flip, sampling, reorient_corners, video_backend, gate=None):
+    reader = _video_readers.get((video_filename, video_backend))
+    if reader is None:
+        reader = _video_readers[video_filename, video_backend] = open_reader(video_filename, video_backend, gray=True)
+    reorienter = get_reorienter(rotate, v_flip, h_flip)
+    shape = None
+    results = []
+    sampler = FrameSampler(reader, frame_indices, sampling)
+    for nth_frame, frame in sampler:
+        _, shape, corners, score = detect_oriented(detector, reorienter, frame, reorient_corners, gate)
+        results.append((nth_frame, corners, score))
+    skipped = gate.skipped if gate is not None else 0
+    return shape, results, skipped, sampler.stats["missed"]
+
+def chunked(frame_indices, chunk_size):
+    chunk = []
+    for nth_frame in frame_indices:
+        chunk.append(nth_frame)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class DetectionPool:
+    '''
+    Splits the sampled frame numbers into contiguous chunks and hands them
+    to worker processes, each of which decodes and searches its own chunks.
+    Results come back in frame order regardless of which worker finishes
+    first. A sharpness gate is copied into every chunk with the threshold
+    it was calibrated with, so the workers skip the frames a serial run
+    would; skipped counts what the copies rejected, and missed the frames
+    the workers could not seek to.
+    '''
+    def __init__(self, workers, chunk_size=32, chunks_in_flight=None):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        # Chunks handed to the executor cannot be taken back once a worker
+        # has picked them up, so submit only enough to keep every worker
+        # busy and a caller that stops early waits for little else.
+        self.chunks_in_flight = chunks_in_flight or 2 * workers
+        self.skipped = 0
+        self.missed = 0
+
+    def detect(self, video_filename, frame_indices, detector, rotate=0, v_flip=False, h_flip=False, sampling="auto", reorient_corners=False, video_backend="auto", gate=None):
+        # Workers must not inherit the Qt state of the GUI process.
+        context = multiprocessing.get_context("spawn")
+        chunks = chunked(frame_indices, self.chunk_size)
+        futures = collections.deque()
+        # Each worker is one core of the budget, so OpenCV must not start a
+        # thread per core inside it as well.
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=cv2.setNumThreads, initargs=(1,)) as executor:
+            def submit():
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    futures.append(executor.submit(
+                        detect_chunk,
+                        video_filename,
+                        chunk,
+                        detector,
+                        rotate,
+                        v_flip,
+                        h_flip,
+                        sampling,
+                        reorient_corners,
+                        video_backend,
+                        gate,
+                    ))
+            for _ in range(self.chunks_in_flight):
+                submit()
+            try:
+                while futures:
+                    shape, results, skipped, missed = futures.popleft().result()
+                    self.skipped += skipped
+                    self.missed += missed
+                    submit()
+                    for nth_frame, corners, score in results:
+                        yield shape, nth_frame, corners, score
+            finally:
+                for future in futures:
+                    future.cancel()
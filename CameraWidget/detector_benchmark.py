@@ -0,0 +1,90 @@
+import itertools
+import time
+
+import cv2
+import numpy as np
+
+from CameraWidget.detection import CRITERIA, DETECTORS, ChessboardDetector, make_detector, to_gray
+from CameraWidget.frame_sampler import FrameSampler, sample_indices
+from CameraWidget.video_reader import open_reader
+
+SAMPLE_FRAMES = 20
+
+def homography_residual(corners, nx, ny):
+    '''
+    RMS distance in pixels between the detected corners and the best
+    homography of an ideal grid onto them. Lens distortion adds the same
+    amount for every engine, so the difference between engines measures
+    how precisely each locates the corners.
+    '''
+    grid = np.mgrid[0:nx, 0:ny].T.reshape(-1, 2).astype(np.float32)
+    points = corners.reshape(-1, 2).astype(np.float32)
+    H, _ = cv2.findHomography(grid, points, 0)
+    if H is None:
+        return np.inf
+    projected = cv2.perspectiveTransform(grid[:, None], H).reshape(-1, 2)
+    return float(np.sqrt(np.mean(np.sum((projected - points) ** 2, axis=1))))
+
+def load_sample_frames(video_filename, sample_rate=1, count=SAMPLE_FRAMES, video_backend="auto"):
+    '''
+    Grayscale copies of count sampled frames spread evenly over the video.
+    '''
+    reader = open_reader(video_filename, video_backend, gray=True)
+    frame_indices = sample_indices(reader.frame_count(), sample_rate)
+    if reader.frame_count() > 0:
+        frame_indices = list(frame_indices)
+        if len(frame_indices) > count:
+            picks = np.linspace(0, len(frame_indices) - 1, count).astype(int)
+            frame_indices = [frame_indices[i] for i in picks]
+    else:
+        frame_indices = itertools.islice(frame_indices, count)
+    # Some readers hand out views into decoder buffers that get reused.
+    return [to_gray(frame).copy() for _, frame in FrameSampler(reader, frame_indices)]
+
+def benchmark_detectors(frames, nx, ny, engines=None, criteria=CRITERIA, scale=1.0):
+    '''
+    Runs every engine over the same frames. Returns, per engine name, the
+    mean seconds per frame, the number of boards found and the median
+    homography residual of those boards.
+    '''
+    results = {}
+    for engine in engines or DETECTORS:
+        detector = make_detector(engine, nx, ny, criteria, scale)
+        residuals = []
+        start = time.perf_counter()
+        for gray in frames:
+            corners = detector.detect(gray)
+            if corners is not None:
+                residuals.append(corners)
+        seconds = (time.perf_counter() - start) / max(len(frames), 1)
+        residuals = [homography_residual(corners, nx, ny) for corners in residuals]
+        results[engine] = {
+            "seconds": seconds,
+            "found": len(residuals),
+            "residual": float(np.median(residuals)) if residuals else np.inf,
+        }
+    return results
+
+def choose_detector(results, residual_tolerance=0.1, min_recall=0.9):
+    '''
+    The fastest engine that finds at least min_recall of the boards the
+    best engine finds, with a median residual within residual_tolerance
+    pixels of the most accurate one. Falls back to the classic engine
+    when no engine found a board.
+    '''
+    best_found = max(result["found"] for result in results.values())
+    if best_found == 0:
+        return ChessboardDetector.name
+    best_residual = min(result["residual"] for result in results.values())
+    qualifying = [
+        engine for engine, result in results.items()
+        if result["found"] >= min_recall * best_found
+        and result["residual"] <= best_residual + residual_tolerance
+    ]
+    return min(qualifying, key=lambda engine: results[engine]["seconds"])
+
+def summarize(results):
+    return ", ".join(
+        f"{engine} {1000 * result['seconds']:.0f} ms/frame, {result['found']} found, {result['residual']:.3f} px"
+        for engine, result in results.items()
+    )
@@ -0,0 +1,139 @@
+import itertools
+import time
+
+# A jump this long is cheaper as a seek than as grabs for any sane GOP size,
+# even before either cost has been measured.
+LONG_GAP = 300
+
+def sample_indices(total_frames, sample_rate, start=0):
+    '''
+    Frame numbers (1-based, as counted by the original read loop) that a
+    given sample rate visits. When the container does not report a frame
+    count the sequence is open ended and the sampler stops at end of stream.
+    '''
+    first = (start // sample_rate + 1) * sample_rate
+    if total_frames > 0:
+        return range(first, total_frames + 1, sample_rate)
+    return itertools.count(first, sample_rate)
+
+def bisection_order(frame_indices):
+    '''
+    Reorders a finite sequence of frame numbers coarse to fine: the first
+    frame, then the middle, then the quarters, the eighths and so on. Any
+    prefix of the result is spread over the whole video, so a search that
+    stops early has still seen every part of it.
+    '''
+    frame_indices = list(frame_indices)
+    if not frame_indices:
+        return
+    step = 1 << (len(frame_indices) - 1).bit_length()
+    yield frame_indices[0]
+    while step > 1:
+        half = step // 2
+        yield from frame_indices[half::step]
+        step = half
+
+class FrameSampler:
+    '''
+    Decodes only the requested frames of a video reader (see video_reader).
+
+    Frames between two targets are skipped either with grab(), which
+    demuxes and decodes but skips the colour conversion done by retrieve(),
+    or with a seek, which jumps to the nearest keyframe and decodes forward
+    from there. In "auto" mode the sampler times both and picks the cheaper
+    one for every gap, so long-GOP codecs end up grabbing short gaps and
+    seeking long ones while intra-only codecs always seek.
+
+    A seek that lands past its target turns seeking off. The sampler then
+    goes back to where it was and grabs forward, or, when the target lies
+    behind that, gives the frame up and counts it in stats["missed"].
+    '''
+    def __init__(self, reader, frame_indices, strategy="auto"):
+        if strategy not in ("auto", "grab", "seek", "read"):
+            raise ValueError(f"Unknown sampling strategy: {strategy}")
+        self.reader = reader
+        self.frame_indices = frame_indices
+        self.strategy = strategy
+        self.position = reader.position()
+        self.intra_only = reader.intra_only()
+        self.seekable = strategy != "grab"
+        self.grab_cost = None
+        self.seek_cost = None
+        self.stats = {"grabbed": 0, "seeks": 0, "decoded": 0, "missed": 0}
+
+    def use_seek(self, gap):
+        if not self.seekable:
+            return False
+        if self.strategy == "seek" or self.intra_only:
+            return True
+        if self.strategy == "read":
+            return False
+        if self.grab_cost is None:
+            return gap > LONG_GAP
+        if self.seek_cost is None:
+            # Try one seek as soon as a gap is long enough to plausibly win.
+            return gap > 2
+        return gap * self.grab_cost > self.seek_cost
+
+    def seek(self, target):
+        start = time.perf_counter()
+        if not self.reader.seek(target):
+            # Inaccurate seeking in this container, stick to grabbing.
+            self.seekable = False
+            self.position = self.reader.position()
+            return False
+        self.position = target
+        self.stats["seeks"] += 1
+        return start
+
+    def rewind(self, position):
+        '''
+        Returns to a position decoded before, after a seek overshot.
+        '''
+        if self.reader.seek(position):
+            self.position = position
+            return True
+        self.position = self.reader.position()
+        return False
+
+    def skip(self, target):
+        start = time.perf_counter()
+        skipped = 0
+        while self.position < target:
+            if self.strategy == "read":
+                status, _ = self.reader.read()
+            else:
+                status = self.reader.grab()
+            if not status:
+                return False
+            self.position += 1
+            skipped += 1
+        if skipped:
+            cost = (time.perf_counter() - start) / skipped
+            self.grab_cost = cost if self.grab_cost is None else 0.8 * self.grab_cost + 0.2 * cost
+            self.stats["grabbed"] += skipped
+        return True
+
+    def __iter__(self):
+        for nth_frame in self.frame_indices:
+            target = nth_frame - 1
+            previous = self.position
+            gap = target - previous
+            seek_start = None
+            if gap < 0 or (gap > 0 and self.use_seek(gap)):
+                seek_start = self.seek(target)
+                if not seek_start and self.position > target:
+                    if previous > target or (not self.rewind(previous) and self.position > target):
+                        self.stats["missed"] += 1
+                        continue
+            if not self.skip(target):
+                return
+            status, frame = self.reader.read()
+            if not status:
+                return
+            self.position += 1
+            self.stats["decoded"] += 1
+            if seek_start:
+                cost = time.perf_counter() - seek_start
+                self.seek_cost = cost if self.seek_cost is None else 0.8 * self.seek_cost + 0.2 * cost
+            yield nth_frame, frame
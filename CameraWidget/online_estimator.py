@@ -0,0 +1,85 @@
+import threading
+
+import cv2
+
+from CameraWidget.dataset import CalibrationDataset
+from CameraWidget.view_selection import select_views
+
+# Without lens distortion only the pinhole terms are estimated.
+PINHOLE_FLAGS = (
+    cv2.CALIB_FIX_K1
+    | cv2.CALIB_FIX_K2
+    | cv2.CALIB_FIX_K3
+    | cv2.CALIB_ZERO_TANGENT_DIST
+)
+
+class OnlineEstimator:
+    '''
+    Re-solves the camera intrinsics on a background thread while detection
+    is still running, so a hopeless calibration shows up early.
+
+    Detection only appends views to a CalibrationDataset under a lock and
+    never waits for a solve. Rows already appended never change, so a solve
+    works on a view of the filled rows without copying them.
+
+    Every interval seconds, if views arrived since the last solve, the
+    thread picks at most max_views of them with select_views and runs
+    calibrateCamera on those. The cost of a solve therefore stays the same
+    however long the video is. Each result is handed to callback as
+    (views found, mtx, dist, RMS reprojection error in pixels).
+    '''
+    def __init__(self, objp, nx, ny, callback, distorted=True, max_views=20, min_views=5, interval=2.0):
+        self.dataset = CalibrationDataset(objp)
+        self.nx = nx
+        self.ny = ny
+        self.callback = callback
+        self.flags = 0 if distorted else PINHOLE_FLAGS
+        self.max_views = max_views
+        self.min_views = max(min_views, 1)
+        self.interval = interval
+        self.solved = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def add(self, nth_frame, corners, shape):
+        with self.lock:
+            self.dataset.append(nth_frame, corners)
+            self.dataset.shape = shape
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.solve()
+
+    def solve(self):
+        with self.lock:
+            points = self.dataset.points
+            shape = self.dataset.shape
+        if len(points) < self.min_views or len(points) == self.solved:
+            return
+        self.solved = len(points)
+        kept = select_views(points, shape, self.nx, self.ny, self.max_views)
+        h, w = shape
+        try:
+            rms, mtx, dist, _, _ = cv2.calibrateCamera(
+                self.dataset.objpoints(len(kept)),
+                [points[i].reshape(-1, 1, 2) for i in kept],
+                (w, h),
+                None,
+                None,
+                flags=self.flags,
+            )
+        except cv2.error:
+            # Too few or degenerate views so far; later views may fix it.
+            return
+        self.callback((len(points), mtx, dist, rms))
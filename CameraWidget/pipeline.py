@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+
+DONE = object()
+
+class StageStats:
+    def __init__(self, name, threads=1):
+        self.name = name
+        self.threads = threads
+        self.busy = 0.0
+        self.items = 0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.busy += seconds
+            self.items += 1
+
+    def utilization(self, wall):
+        return self.busy / (wall * self.threads) if wall > 0 else 0.0
+
+class DetectionPipeline:
+    '''
+    Runs decoding, detection and result collection as concurrent stages
+    joined by bounded queues.
+
+    A decoder thread pulls frames from any iterable (normally a
+    FrameSampler), detect_threads threads run detect_fn on them (OpenCV
+    releases the GIL, so these overlap with decoding and with each other),
+    and the generator returned by run() collects results back into input
+    order. A full queue blocks the stage feeding it, so at most queue_depth
+    frames wait between two stages and a slow stage throttles the ones
+    before it rather than piling up frames in memory.
+
+    Each stage records the time it spent working, as opposed to waiting on
+    its queues; utilization() reports that as a fraction of wall time, so
+    the bottleneck is the stage close to 100%.
+    '''
+    def __init__(self, queue_depth=4, detect_threads=1):
+        self.queue_depth = max(queue_depth, 1)
+        self.detect_threads = max(detect_threads, 1)
+        self.stats = {
+            "decode": StageStats("decode"),
+            "detect": StageStats("detect", self.detect_threads),
+            "collect": StageStats("collect"),
+        }
+        self.wall = 0.0
+        self.error = None
+        self.stop = threading.Event()
+
+    def utilization(self):
+        return {name: stage.utilization(self.wall) for name, stage in self.stats.items()}
+
+    def put(self, target, item):
+        while not self.stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, source):
+        while not self.stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return DONE
+
+    def fail(self, error):
+        if self.error is None:
+            self.error = error
+        self.stop.set()
+
+    def decode(self, frames, decoded):
+        stats = self.stats["decode"]
+        try:
+            iterator = iter(frames)
+            seq = 0
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.add(time.perf_counter() - start)
+                if not self.put(decoded, (seq, item)):
+                    return
+                seq += 1
+        except Exception as error:
+            self.fail(error)
+        finally:
+            for _ in range(self.detect_threads):
+                self.put(decoded, DONE)
+
+    def detect(self, detect_fn, decoded, results):
+        stats = self.stats["detect"]
+        try:
+            while True:
+                item = self.get(decoded)
+                if item is DONE:
+                    break
+                seq, args = item
+                start = time.perf_counter()
+                result = detect_fn(*args)
+                stats.add(time.perf_counter() - start)
+                if not self.put(results, (seq, result)):
+                    return
+        except Exception as error:
+            self.fail(error)
+        finally:
+            self.put(results, DONE)
+
+    def run(self, frames, detect_fn):
+        decoded = queue.Queue(self.queue_depth)
+        results = queue.Queue(self.queue_depth)
+        threads = [threading.Thread(target=self.decode, args=(frames, decoded), daemon=True)]
+        threads += [
+            threading.Thread(target=self.detect, args=(detect_fn, decoded, results), daemon=True)
+            for _ in range(self.detect_threads)
+        ]
+        stats = self.stats["collect"]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        pending = {}
+        next_seq = 0
+        finished = 0
+        try:
+            while finished < self.detect_threads:
+                item = self.get(results)
+                if item is DONE:
+                    if self.stop.is_set():
+                        break
+                    finished += 1
+                    continue
+                seq, result = item
+                pending[seq] = result
+                while next_seq in pending:
+                    collect_start = time.perf_counter()
+                    yield pending.pop(next_seq)
+                    stats.add(time.perf_counter() - collect_start)
+                    next_seq += 1
+        finally:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+            self.wall = time.perf_counter() - start
+        if self.error is not None:
+            raise self.error
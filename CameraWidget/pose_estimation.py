@@ -0,0 +1,139 @@
+import cv2
+import numpy as np
+
+def normalizing_transform(points):
+    '''
+    Similarity transforms (..., 3, 3) moving each point set's centroid to
+    the origin and its mean distance to sqrt(2), which keeps the DLT well
+    conditioned.
+    '''
+    mean = points.mean(axis=-2)
+    dist = np.linalg.norm(points - mean[..., None, :], axis=-1).mean(axis=-1)
+    scale = np.sqrt(2) / np.maximum(dist, 1e-12)
+    T = np.zeros(points.shape[:-2] + (3, 3))
+    T[..., 0, 0] = scale
+    T[..., 1, 1] = scale
+    T[..., 0, 2] = -scale * mean[..., 0]
+    T[..., 1, 2] = -scale * mean[..., 1]
+    T[..., 2, 2] = 1
+    return T
+
+def apply_transform(T, points):
+    return points * T[..., None, [0, 1], [0, 1]] + T[..., None, [0, 1], 2]
+
+def batch_homographies(plane_points, imgpoints):
+    '''
+    Homographies (views, 3, 3) mapping the shared (N, 2) plane points onto
+    each view's (views, N, 2) image points, by a normalized DLT solved for
+    all views at once.
+    '''
+    views, n = imgpoints.shape[:2]
+    T_obj = normalizing_transform(plane_points)
+    T_img = normalizing_transform(imgpoints)
+    X = apply_transform(T_obj, plane_points)
+    x = apply_transform(T_img, imgpoints)
+
+    A = np.zeros((views, 2 * n, 9))
+    ones = np.ones(n)
+    A[:, 0::2, 0:2] = X
+    A[:, 0::2, 2] = ones
+    A[:, 0::2, 6:8] = -x[..., 0:1] * X
+    A[:, 0::2, 8] = -x[..., 0]
+    A[:, 1::2, 3:5] = X
+    A[:, 1::2, 5] = ones
+    A[:, 1::2, 6:8] = -x[..., 1:2] * X
+    A[:, 1::2, 8] = -x[..., 1]
+    # The null vector of A is the eigenvector of AᵀA with the smallest
+    # eigenvalue; eigh on 9x9 blocks is much cheaper than an SVD of A.
+    _, vectors = np.linalg.eigh(np.swapaxes(A, 1, 2) @ A)
+    H = vectors[:, :, 0].reshape(views, 3, 3)
+    return np.linalg.inv(T_img) @ H @ T_obj
+
+def rotations_to_rvecs(R):
+    cos = np.clip((np.trace(R, axis1=1, axis2=2) - 1) / 2, -1, 1)
+    angle = np.arccos(cos)
+    axis = np.stack([
+        R[:, 2, 1] - R[:, 1, 2],
+        R[:, 0, 2] - R[:, 2, 0],
+        R[:, 1, 0] - R[:, 0, 1],
+    ], axis=1)
+    sin = np.sin(angle)
+    small = sin < 1e-6
+    rvecs = axis * (angle / np.where(small, 1, 2 * sin))[:, None]
+    rvecs[small & (angle < 1)] = axis[small & (angle < 1)] / 2
+    # Rotations of nearly pi lose their axis in the skew part.
+    for i in np.flatnonzero(small & (angle >= 1)):
+        rvecs[i] = cv2.Rodrigues(R[i])[0].ravel()
+    return rvecs
+
+def decompose_homographies(H, mtx):
+    '''
+    Board poses (R, t) from plane-to-image homographies, assuming the
+    board lies on z = 0 and sits in front of the camera.
+    '''
+    B = np.linalg.inv(mtx) @ H
+    scale = 2 / (np.linalg.norm(B[:, :, 0], axis=1) + np.linalg.norm(B[:, :, 1], axis=1))
+    scale *= np.where(B[:, 2, 2] < 0, -1, 1)
+    B = B * scale[:, None, None]
+    R = np.stack([B[:, :, 0], B[:, :, 1], np.cross(B[:, :, 0], B[:, :, 1])], axis=2)
+    # Snap to the nearest proper rotation.
+    U, _, Vt = np.linalg.svd(R)
+    D = np.ones((len(R), 3))
+    D[:, 2] = np.sign(np.linalg.det(U @ Vt))
+    R = (U * D[:, None, :]) @ Vt
+    return R, B[:, :, 2]
+
+def reprojection_errors(objp, imgpoints, R, t, mtx):
+    cam = objp @ np.swapaxes(R, 1, 2) + t[:, None, :]
+    proj = cam @ mtx.T
+    proj = proj[..., :2] / proj[..., 2:3]
+    return np.linalg.norm(proj - imgpoints, axis=-1).mean(axis=-1)
+
+def estimate_poses(objp, imgpoints, mtx, dist=None, refine=False, max_residual=2.0):
+    '''
+    Board pose of every view of a planar target.
+
+    All views are solved together from their homographies. Views whose mean
+    reprojection error is above max_residual pixels, or which are
+    degenerate, fall back to solvePnPRansac. With refine the remaining views
+    are polished with Levenberg-Marquardt. Returns lists of rvecs and tvecs
+    aligned with imgpoints, with None for views no method could solve, and
+    the indices of the views that needed the fallback.
+    '''
+    objp = np.asarray(objp, dtype=np.float64).reshape(-1, 3)
+    if np.any(objp[:, 2] != 0):
+        raise ValueError("Batch pose estimation requires a planar target on z = 0")
+    mtx = np.asarray(mtx, dtype=np.float64)
+    if dist is None:
+        dist = np.zeros(5)
+    corners = np.asarray(imgpoints, dtype=np.float64).reshape(len(imgpoints), -1, 2)
+    views, n = corners.shape[:2]
+    if np.any(dist):
+        corners = cv2.undistortPoints(corners.reshape(-1, 1, 2), mtx, dist, P=mtx).reshape(views, n, 2)
+
+    H = batch_homographies(objp[:, :2], corners)
+    R, t = decompose_homographies(H, mtx)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        errors = reprojection_errors(objp, corners, R, t, mtx)
+    good = np.isfinite(errors) & (errors <= max_residual) & (t[:, 2] > 0)
+    rvecs = list(rotations_to_rvecs(R).reshape(views, 3, 1))
+    tvecs = list(t.reshape(views, 3, 1))
+
+    fallback = np.flatnonzero(~good)
+    for i in fallback:
+        retval, rvec, tvec, inliers = cv2.solvePnPRansac(
+            objp,
+            imgpoints[i],
+            mtx,
+            dist,
+            confidence=0.9,
+            reprojectionError=30,
+        )
+        rvecs[i] = rvec if retval else None
+        tvecs[i] = tvec if retval else None
+
+    if refine:
+        for i in np.flatnonzero(good):
+            rvecs[i], tvecs[i] = cv2.solvePnPRefineLM(objp, imgpoints[i], mtx, dist, rvecs[i], tvecs[i])
+
+    return rvecs, tvecs, fallback.tolist()
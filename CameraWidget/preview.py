@@ -0,0 +1,34 @@
+import time
+
+import cv2
+
+THUMBNAIL_HEIGHT = 128
+
+def make_thumbnail(frame, height=THUMBNAIL_HEIGHT):
+    '''
+    Downscaled copy of frame with the given height, and the scale factor
+    applied, so overlays can be drawn on it in thumbnail coordinates.
+    '''
+    scale = height / frame.shape[0]
+    width = max(int(round(frame.shape[1] * scale)), 1)
+    if frame.shape[0] == height:
+        return frame, 1.0
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA), scale
+
+class PreviewThrottle:
+    '''
+    Rate limit for preview emissions from a worker thread. Anything faster
+    than the GUI can paint only fills the queued connection. clock returns
+    the time in seconds.
+    '''
+    def __init__(self, fps=10, clock=time.monotonic):
+        self.interval = 1 / fps if fps else 0
+        self.clock = clock
+        self.last = None
+
+    def ready(self):
+        now = self.clock()
+        if self.last is not None and now - self.last < self.interval:
+            return False
+        self.last = now
+        return True
@@ -0,0 +1,112 @@
+import functools
+
+import cv2
+import numpy as np
+
+RIGHT_ANGLES = {
+    90: cv2.ROTATE_90_COUNTERCLOCKWISE,
+    270: cv2.ROTATE_90_CLOCKWISE,
+}
+
+class Reorienter:
+    '''
+    Rotates a frame counterclockwise by rotate degrees and then flips it.
+
+    Right angles are done losslessly with cv2.rotate and cv2.flip, which
+    only move pixels and keep the whole frame. Rotating by 180 degrees is
+    the same as flipping both ways, and flipping both ways after any
+    rotation is the same as rotating 180 degrees further, so every right
+    angle case takes at most one rotate and one flip. Any other angle is a
+    single warpAffine about the frame centre, cropped to the input size,
+    with the flips folded into its matrix. That matrix is cached per frame
+    size.
+    '''
+    def __init__(self, rotate=0, v_flip=False, h_flip=False):
+        self.rotate = rotate % 360
+        self.v_flip = bool(v_flip)
+        self.h_flip = bool(h_flip)
+        self.right_angle = self.rotate % 90 == 0
+        self.matrices = {}
+
+        rotate, v_flip, h_flip = self.rotate, self.v_flip, self.h_flip
+        if self.right_angle:
+            if v_flip and h_flip:
+                rotate, v_flip, h_flip = (rotate + 180) % 360, False, False
+            if rotate == 180:
+                rotate, v_flip, h_flip = 0, not v_flip, not h_flip
+        self.rotate_code = RIGHT_ANGLES.get(rotate)
+        if v_flip and h_flip:
+            self.flip_code = -1
+        elif v_flip:
+            self.flip_code = 0
+        elif h_flip:
+            self.flip_code = 1
+        else:
+            self.flip_code = None
+
+    def is_identity(self):
+        return self.right_angle and self.rotate_code is None and self.flip_code is None
+
+    def mirrors(self):
+        # Flipping both ways is a half turn; only a single flip mirrors.
+        return self.v_flip != self.h_flip
+
+    def output_shape(self, shape):
+        height, width = shape[:2]
+        if self.rotate_code is not None:
+            return (width, height)
+        return (height, width)
+
+    def matrix(self, shape):
+        '''
+        2x3 affine matrix taking input pixel coordinates to output pixel
+        coordinates for frames of the given shape.
+        '''
+        height, width = shape[:2]
+        key = (height, width)
+        if key not in self.matrices:
+            if self.right_angle:
+                M = np.eye(3)
+                if self.rotate == 90:
+                    M = np.array([[0, 1, 0], [-1, 0, width - 1], [0, 0, 1.0]])
+                elif self.rotate == 180:
+                    M = np.array([[-1, 0, width - 1], [0, -1, height - 1], [0, 0, 1.0]])
+                elif self.rotate == 270:
+                    M = np.array([[0, -1, height - 1], [1, 0, 0], [0, 0, 1.0]])
+            else:
+                M = np.vstack([
+                    cv2.getRotationMatrix2D((width // 2, height // 2), self.rotate, 1.0),
+                    [0, 0, 1],
+                ])
+            out_height, out_width = self.output_shape(shape)
+            if self.v_flip:
+                M = np.array([[1, 0, 0], [0, -1, out_height - 1], [0, 0, 1.0]]) @ M
+            if self.h_flip:
+                M = np.array([[-1, 0, out_width - 1], [0, 1, 0], [0, 0, 1.0]]) @ M
+            self.matrices[key] = M[:2]
+        return self.matrices[key]
+
+    def transform_points(self, points, shape):
+        '''
+        Maps pixel coordinates found in an unoriented frame of the given
+        shape to where they lie in the reoriented frame.
+        '''
+        M = self.matrix(shape)
+        return (points @ M[:, :2].T + M[:, 2]).astype(points.dtype)
+
+    def __call__(self, frame):
+        if not self.right_angle:
+            height, width = frame.shape[:2]
+            return cv2.warpAffine(frame, self.matrix(frame.shape), (width, height))
+        if self.rotate_code is not None:
+            frame = cv2.rotate(frame, self.rotate_code)
+        if self.flip_code is not None:
+            frame = cv2.flip(frame, self.flip_code)
+        return frame
+
+@functools.lru_cache(maxsize=32)
+def get_reorienter(rotate=0, v_flip=False, h_flip=False):
+    return Reorienter(rotate, v_flip, h_flip)
+
+def reorient(frame, rotate=0, v_flip=False, h_flip=False):
+    return get_reorienter(rotate, v_flip, h_flip)(frame)
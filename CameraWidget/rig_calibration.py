@@ -0,0 +1,343 @@
+import cv2
+import numpy as np
+
+from CameraWidget.bundle_adjustment import CHUNK_SIZE, POSE, intrinsics_vector, pose_vector, project, rodrigues
+from CameraWidget.view_selection import select_views
+
+# Fewest frames two cameras must both see the board in before their
+# relative pose is estimated from them.
+MIN_SHARED_VIEWS = 5
+
+# Relative rotations closer than this, in degrees, count as agreeing when
+# resolving which way round a board was found.
+ORIENTATION_TOLERANCE = 5.0
+
+# Alternating passes over boards and cameras before bundle adjustment.
+REFINE_ITERATIONS = 5
+
+# Frames whose orientation candidates are scored against every shared
+# frame to seed the consensus.
+ORIENTATION_SAMPLES = 16
+
+def join_detections(detections, offsets=None):
+    '''
+    Groups per-camera detections, each a dict of frame number to corners,
+    by synchronized frame: a camera's frame number plus its offset.
+    Returns {frame: {camera: (N, 2) corners}} for the frames at least two
+    cameras found the board in.
+    '''
+    joined = {}
+    for camera, frames in enumerate(detections):
+        offset = offsets[camera] if offsets is not None else 0
+        for nth_frame, corners in frames.items():
+            joined.setdefault(nth_frame + offset, {})[camera] = corners.reshape(-1, 2)
+    return {frame: views for frame, views in joined.items() if len(views) > 1}
+
+def board_pose(objp, corners, mtx, dist):
+    '''
+    Rotation matrix and translation taking board points into the camera.
+    '''
+    _, rvec, tvec = cv2.solvePnP(objp, corners, mtx, dist, flags=cv2.SOLVEPNP_IPPE)
+    return cv2.Rodrigues(rvec)[0], tvec.reshape(3, 1)
+
+def chordal_mean(rotations):
+    '''
+    The rotation nearest, in the Frobenius norm, to the mean of rotations.
+    '''
+    U, _, Vt = np.linalg.svd(np.sum(rotations, axis=0))
+    return U @ np.diag([1.0, 1.0, np.linalg.det(U @ Vt)]) @ Vt
+
+def turned_pose(objp, R, t):
+    '''
+    Pose of a board given the pose its corners fit in reverse order.
+    Reversing a grid's corners swaps each with its mirror through the
+    centre, which is the board turned half way round in its own plane.
+    '''
+    far = (objp[0] + objp[-1]).reshape(3, 1)
+    return R * [-1, -1, 1], t + R @ far
+
+def align_orientation(rotations_a, rotations_b, tolerance=ORIENTATION_TOLERANCE, samples=ORIENTATION_SAMPLES):
+    '''
+    A board found turned half way round lists its corners in reverse, and
+    two cameras need not agree on which way round they found it. Given the
+    board rotations (frames, 3, 3) each camera's views give, returns which
+    of b's views to reverse so that b's pose relative to a agrees with the
+    one most frames support.
+
+    Only the candidates of a few evenly spaced frames are scored against
+    every frame. The chordal mean of the candidates agreeing with the best
+    of them is the consensus each frame's order is then chosen by, so the
+    cost grows linearly with the frames.
+    '''
+    relative = rotations_b @ rotations_a.transpose(0, 2, 1)
+    turned = (rotations_b * [-1, -1, 1]) @ rotations_a.transpose(0, 2, 1)
+    candidates = np.stack([relative, turned], axis=1)
+    # trace(R1 R2ᵀ) = 1 + 2 cos(angle between them)
+    threshold = 1 + 2 * np.cos(np.radians(tolerance))
+    sampled = candidates[np.unique(np.linspace(0, len(candidates) - 1, samples).astype(int))].reshape(-1, 3, 3)
+    agree = np.einsum("sij,fkij->sfk", sampled, candidates) > threshold
+    seed = sampled[int(np.argmax(agree.any(axis=2).sum(axis=1)))]
+    near = np.einsum("ij,fkij->fk", seed, candidates)
+    chosen = candidates[np.arange(len(candidates)), np.argmax(near, axis=1)]
+    consensus = chordal_mean(chosen[near.max(axis=1) > threshold])
+    return np.argmax(np.einsum("ij,fkij->fk", consensus, candidates), axis=1) == 1
+
+class RigCalibration:
+    '''
+    Poses of a rig of cameras with known intrinsics, in the frame of the
+    reference camera.
+
+    extrinsics[c] is the (R, t) taking reference camera coordinates into
+    camera c, or None for a camera that shares too few frames with the
+    rest. board_poses holds the (R, t) of the board in reference
+    coordinates for every frame used, observations the corners each camera
+    found in those frames, turned to agree with each other. pairs maps each
+    camera pair solved with stereoCalibrate to (shared frames, RMS error).
+    '''
+    def __init__(self, objp, cameras, reference=0):
+        self.objp = objp
+        self.cameras = cameras
+        self.reference = reference
+        self.extrinsics = [None] * len(cameras)
+        self.extrinsics[reference] = (np.eye(3), np.zeros((3, 1)))
+        self.pairs = {}
+        self.board_poses = {}
+        self.observations = {}
+        self.view_poses = {}
+        self.rms = None
+
+    def connected(self):
+        return [camera for camera, pose in enumerate(self.extrinsics) if pose is not None]
+
+    def stereo(self, joined, a, b, nx, ny, max_views, size):
+        '''
+        Relative pose of camera b to camera a from the frames both saw,
+        by cv2.stereoCalibrate with both sets of intrinsics held fixed.
+        '''
+        frames = sorted(frame for frame, views in joined.items() if a in views and b in views)
+        rotations_a = np.stack([self.view_pose(frame, a, joined[frame])[0] for frame in frames])
+        rotations_b = np.stack([self.view_pose(frame, b, joined[frame])[0] for frame in frames])
+        for i in np.flatnonzero(align_orientation(rotations_a, rotations_b)):
+            self.turn_view(frames[i], b, joined[frames[i]])
+        corners_a = {frame: joined[frame][a] for frame in frames}
+        corners_b = {frame: joined[frame][b] for frame in frames}
+        # The solve is dense in the board poses, so it gets a diverse
+        # subset like the single camera solve does.
+        points = np.stack([corners_a[frame] for frame in frames])
+        kept = [frames[i] for i in select_views(points, size[::-1], nx, ny, max_views)]
+        (mtx_a, dist_a), (mtx_b, dist_b) = self.cameras[a], self.cameras[b]
+        rms, _, _, _, _, R, T, _, _ = cv2.stereoCalibrate(
+            [self.objp] * len(kept),
+            [corners_a[frame].reshape(-1, 1, 2) for frame in kept],
+            [corners_b[frame].reshape(-1, 1, 2) for frame in kept],
+            mtx_a,
+            dist_a,
+            mtx_b,
+            dist_b,
+            size,
+            flags=cv2.CALIB_FIX_INTRINSIC,
+        )
+        self.pairs[a, b] = (len(frames), rms)
+        return R, T.reshape(3, 1)
+
+    def parameters(self):
+        '''
+        Intrinsics (cameras, 9) and poses (cameras, 6) of every camera in
+        the layout bundle_adjustment.project takes, zero for cameras not
+        placed.
+        '''
+        intrinsics = np.array([intrinsics_vector(*camera) for camera in self.cameras])
+        poses = np.array([pose_vector(*pose) if pose is not None else np.zeros(POSE) for pose in self.extrinsics])
+        return intrinsics, poses
+
+    def squared_errors(self, boards, camera_index, board_index, corners, chunk_size=CHUNK_SIZE):
+        '''
+        Summed squared reprojection error of each observation: the board
+        boards[board_index] seen by camera camera_index as corners, a list
+        of (N, 2) arrays.
+        '''
+        objp = np.asarray(self.objp, dtype=np.float64).reshape(-1, 3)
+        intrinsics, poses = self.parameters()
+        errors = np.zeros(len(corners))
+        for start in range(0, len(corners), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            projected = project(objp, intrinsics, poses, boards, camera_index[chunk], board_index[chunk])
+            errors[chunk] = np.sum((projected - np.asarray(corners[chunk])) ** 2, axis=(1, 2))
+        return errors
+
+    def view_pose(self, frame, camera, views):
+        '''
+        Board pose in camera coordinates from one camera's view alone,
+        solved once per view.
+        '''
+        pose = self.view_poses.get((frame, camera))
+        if pose is None:
+            pose = self.view_poses[frame, camera] = board_pose(self.objp, views[camera], *self.cameras[camera])
+        return pose
+
+    def turn_view(self, frame, camera, views):
+        '''
+        Reverses the order of one view's corners, keeping its pose in step.
+        '''
+        views[camera] = np.ascontiguousarray(views[camera][::-1])
+        if (frame, camera) in self.view_poses:
+            self.view_poses[frame, camera] = turned_pose(self.objp, *self.view_poses[frame, camera])
+
+    def place_boards(self):
+        '''
+        Board pose in reference coordinates for every frame: of the poses
+        the individual cameras give, the one with the least reprojection
+        error over all of them, or the previous estimate if that is better
+        still. The candidates of all frames are scored in one pass.
+        '''
+        candidates = []
+        owners = []
+        camera_index = []
+        board_index = []
+        corners = []
+        frames = list(self.observations)
+        for i, frame in enumerate(frames):
+            views = self.observations[frame]
+            poses = [self.board_poses[frame]] if frame in self.board_poses else []
+            for camera in views:
+                R_c, t_c = self.extrinsics[camera]
+                R_b, t_b = self.view_pose(frame, camera, views)
+                poses.append((R_c.T @ R_b, R_c.T @ (t_b - t_c)))
+            for pose in poses:
+                for camera, view in views.items():
+                    camera_index.append(camera)
+                    board_index.append(len(candidates))
+                    corners.append(view)
+                candidates.append(pose)
+                owners.append(i)
+        if not candidates:
+            return
+        boards = np.array([pose_vector(*pose) for pose in candidates])
+        errors = np.zeros(len(candidates))
+        board_index = np.asarray(board_index)
+        np.add.at(errors, board_index, self.squared_errors(boards, np.asarray(camera_index), board_index, corners))
+        # Candidates come grouped by frame; the first of each group after
+        # sorting by error within it is the best.
+        owners = np.asarray(owners)
+        order = np.lexsort((errors, owners))
+        firsts = order[np.flatnonzero(np.diff(owners[order], prepend=-1))]
+        for i, best in zip(owners[firsts], firsts):
+            self.board_poses[frames[i]] = candidates[best]
+
+    def place_camera(self, camera):
+        '''
+        Camera pose refined by one solvePnP over every board corner it saw,
+        placed in reference coordinates by the current board poses. Each
+        view's corners are also turned to whichever order fits better.
+        '''
+        frames = [frame for frame, views in self.observations.items() if camera in views]
+        boards = np.array([pose_vector(*self.board_poses[frame]) for frame in frames])
+        corners = [self.observations[frame][camera] for frame in frames]
+        flipped = [view[::-1] for view in corners]
+        cameras = np.full(len(frames), camera)
+        board_index = np.arange(len(frames))
+        turn = self.squared_errors(boards, cameras, board_index, flipped) < self.squared_errors(boards, cameras, board_index, corners)
+        for i in np.flatnonzero(turn):
+            self.turn_view(frames[i], camera, self.observations[frames[i]])
+            corners[i] = self.observations[frames[i]][camera]
+        objp = np.asarray(self.objp, dtype=np.float64).reshape(-1, 3)
+        world = np.einsum("fij,nj->fni", rodrigues(boards[:, :3]), objp) + boards[:, None, 3:]
+        R_c, t_c = self.extrinsics[camera]
+        _, rvec, tvec = cv2.solvePnP(
+            world.reshape(-1, 3).astype(np.float32),
+            np.concatenate(corners),
+            *self.cameras[camera],
+            cv2.Rodrigues(R_c)[0],
+            t_c.copy(),
+            useExtrinsicGuess=True,
+            flags=cv2.SOLVEPNP_ITERATIVE,
+        )
+        self.extrinsics[camera] = (cv2.Rodrigues(rvec)[0], tvec.reshape(3, 1))
+
+    def residual(self):
+        frames = list(self.observations)
+        boards = np.array([pose_vector(*self.board_poses[frame]) for frame in frames])
+        camera_index = []
+        board_index = []
+        corners = []
+        for i, frame in enumerate(frames):
+            for camera, view in self.observations[frame].items():
+                camera_index.append(camera)
+                board_index.append(i)
+                corners.append(view)
+        if not corners:
+            return None
+        errors = self.squared_errors(boards, np.asarray(camera_index), np.asarray(board_index), corners)
+        return float(np.sqrt(errors.sum() / (len(corners) * len(self.objp))))
+
+    def refine(self, iterations=REFINE_ITERATIONS, tolerance=1e-4):
+        '''
+        Alternates between placing every board given the cameras and
+        placing every camera but the reference given the boards, until the
+        RMS reprojection error stops improving. This only seeds
+        bundle_adjust, which fits everything jointly, so a few iterations
+        are enough.
+        '''
+        self.rms = self.residual()
+        if self.rms is None:
+            return
+        for _ in range(iterations):
+            self.place_boards()
+            for camera in self.connected():
+                if camera != self.reference:
+                    self.place_camera(camera)
+            rms, previous = self.residual(), self.rms
+            self.rms = rms
+            if rms >= previous * (1 - tolerance):
+                break
+
+def calibrate_rig(datasets, nx, ny, offsets=None, reference=0, min_shared=MIN_SHARED_VIEWS, max_views=60, iterations=REFINE_ITERATIONS, progress=None):
+    '''
+    Extrinsics of a rig from the detections already stored in each camera's
+    CalibrationDataset, without decoding any video again.
+
+    Starting from the reference camera, the camera sharing the most frames
+    with one already placed is placed next, by stereoCalibrate against that
+    one. Every frame seen by two or more placed cameras then goes into a
+    joint alternating refinement of all cameras and board poses. Each step
+    is announced by calling progress with a message.
+    '''
+    progress = progress or (lambda msg: None)
+    cameras = [
+        (dataset.mtx, dataset.dist if dataset.dist is not None else np.zeros(5))
+        for dataset in datasets
+    ]
+    rig = RigCalibration(datasets[reference].objp, cameras, reference)
+    joined = join_detections([dataset.detections for dataset in datasets], offsets)
+    shared = {}
+    for views in joined.values():
+        for a in views:
+            for b in views:
+                if a != b:
+                    shared[a, b] = shared.get((a, b), 0) + 1
+
+    while True:
+        placed = rig.connected()
+        edges = [
+            (count, a, b)
+            for (a, b), count in shared.items()
+            if a in placed and b not in placed and count >= min_shared
+        ]
+        if not edges:
+            break
+        count, a, b = max(edges)
+        progress(f"Placing camera {len(placed) + 1} of {len(datasets)} from {count} shared frames")
+        h, w = datasets[a].shape
+        R, T = rig.stereo(joined, a, b, nx, ny, max_views, (w, h))
+        R_a, t_a = rig.extrinsics[a]
+        rig.extrinsics[b] = (R @ R_a, R @ t_a + T)
+
+    placed = set(rig.connected())
+    for frame, views in joined.items():
+        views = {camera: corners for camera, corners in views.items() if camera in placed}
+        if len(views) > 1:
+            rig.observations[frame] = views
+    progress(f"Refining {len(placed)} cameras over {len(rig.observations)} frames")
+    rig.place_boards()
+    rig.refine(iterations)
+    return rig
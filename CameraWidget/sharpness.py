@@ -0,0 +1,78 @@
+import threading
+
+import cv2
+import numpy as np
+
+# Width the frame is shrunk to before scoring. Motion blur that ruins a
+# chessboard search is still obvious at this size, and the score costs a
+# fraction of a millisecond.
+SHARPNESS_WIDTH = 320
+
+def sharpness(frame, width=SHARPNESS_WIDTH):
+    '''
+    Variance of the Laplacian of a downscaled grayscale copy of a BGR or
+    grayscale frame. Blur removes the high frequencies the Laplacian
+    responds to, so blurred frames score low. Shrinking first keeps the
+    colour conversion off the full frame as well.
+    '''
+    if frame.shape[1] > width:
+        height = max(frame.shape[0] * width // frame.shape[1], 1)
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    _, stddev = cv2.meanStdDev(cv2.Laplacian(frame, cv2.CV_32F))
+    return float(stddev[0, 0] ** 2)
+
+class SharpnessGate:
+    '''
+    Skips frames that are much blurrier than the rest of the video before
+    any chessboard search runs on them.
+
+    A fixed threshold cannot work across cameras and scenes, since the
+    score also depends on texture, noise and exposure. A frame is skipped
+    when it scores below fraction times the median score of a sample of
+    the video's frames, which calibrate() measures once before the search.
+    The threshold then stays fixed, so whether a frame is searched does not
+    depend on the frames searched before it: a run split into chunks over
+    worker processes, or resumed from the detection cache, skips the same
+    frames as a single serial run. Until calibrated every frame is searched.
+
+    The gate may be shared between detect threads.
+    '''
+    def __init__(self, fraction=0.5, samples=20):
+        self.fraction = fraction
+        self.samples = samples
+        self.threshold = None
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes each get their own copy, and locks do not pickle.
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def get_params(self):
+        return {"fraction": self.fraction, "samples": self.samples}
+
+    def calibrate(self, frames):
+        '''
+        Sets the threshold from a sample of frames.
+        '''
+        scores = [sharpness(frame) for frame in frames]
+        self.threshold = self.fraction * float(np.median(scores)) if scores else None
+
+    def __call__(self, frame):
+        '''
+        Scores a frame. Returns whether it should be searched, and the score.
+        '''
+        score = sharpness(frame)
+        accepted = self.threshold is None or score >= self.threshold
+        if not accepted:
+            with self.lock:
+                self.skipped += 1
+        return accepted, score
@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+
+from CameraWidget.detection import SUBPIX_WINDOW
+
+LK_PARAMS = dict(
+    winSize=(21, 21),
+    maxLevel=3,
+    criteria=(cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 30, 0.01),
+)
+
+class CornerTracker:
+    '''
+    Wraps a ChessboardDetector and follows the board from one sampled frame
+    to the next with pyramidal Lucas-Kanade flow instead of searching every
+    frame from scratch.
+
+    Tracked corners are accepted only if every point was followed, the grid
+    is still locally regular (each corner sits close to the midpoint of its
+    row and column neighbours, which holds under perspective and lens
+    distortion but not when points slip onto the wrong corner) and
+    cornerSubPix does not have to move them far. Otherwise the tracker
+    falls back to a full search.
+
+    A tracker carries state from one frame to the next, so it must see
+    frames in order and may not be shared between threads.
+    '''
+    def __init__(self, detector, max_irregularity=0.25, max_correction=0.25):
+        self.detector = detector
+        self.nx, self.ny = detector.chessboard_dims
+        self.criteria = detector.criteria
+        self.max_irregularity = max_irregularity
+        self.max_correction = max_correction
+        self.prev_gray = None
+        self.prev_corners = None
+        self.stats = {"tracked": 0, "searched": 0, "lost": 0}
+
+    @property
+    def chessboard_dims(self):
+        return self.detector.chessboard_dims
+
+    def get_params(self):
+        return dict(self.detector.get_params(), tracking=True)
+
+    def grid_spacing(self, grid):
+        rows = np.linalg.norm(np.diff(grid, axis=1), axis=-1)
+        cols = np.linalg.norm(np.diff(grid, axis=0), axis=-1)
+        return np.concatenate([rows.ravel(), cols.ravel()]).mean()
+
+    def is_regular(self, corners):
+        grid = corners.reshape(self.ny, self.nx, 2).astype(np.float64)
+        spacing = self.grid_spacing(grid)
+        if not np.isfinite(spacing) or spacing < 1:
+            return False, spacing
+        row_bend = grid[:, :-2] + grid[:, 2:] - 2 * grid[:, 1:-1]
+        col_bend = grid[:-2] + grid[2:] - 2 * grid[1:-1]
+        bend = max(
+            np.linalg.norm(row_bend, axis=-1).max(initial=0),
+            np.linalg.norm(col_bend, axis=-1).max(initial=0),
+        )
+        return bend < self.max_irregularity * spacing, spacing
+
+    def search_region(self, shape):
+        # The flow only needs the area the board can have moved within, and
+        # building pyramids over a whole 4K frame would cost as much as a
+        # full search.
+        height, width = shape[:2]
+        points = self.prev_corners.reshape(-1, 2)
+        low, high = points.min(axis=0), points.max(axis=0)
+        pad = 0.5 * (high - low).max() + LK_PARAMS["winSize"][0] * 2 ** LK_PARAMS["maxLevel"]
+        x0, y0 = np.maximum(np.floor(low - pad).astype(int), 0)
+        x1, y1 = np.minimum(np.ceil(high + pad).astype(int), [width, height])
+        return x0, y0, x1, y1
+
+    def track(self, gray):
+        if self.prev_gray.shape != gray.shape:
+            return None
+        x0, y0, x1, y1 = self.search_region(gray.shape)
+        offset = np.array([x0, y0], dtype=np.float32)
+        corners, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray[y0:y1, x0:x1],
+            gray[y0:y1, x0:x1],
+            self.prev_corners - offset,
+            None,
+            **LK_PARAMS,
+        )
+        if corners is None or not status.all():
+            return None
+        corners += offset
+        # Near the border the refinement window is clipped and a board that
+        # is leaving the frame can no longer be verified, so hand over to a
+        # full search.
+        height, width = gray.shape[:2]
+        margin = np.array(SUBPIX_WINDOW)
+        points = corners.reshape(-1, 2)
+        if np.any(points < margin) or np.any(points > np.array([width, height]) - 1 - margin):
+            return None
+        regular, spacing = self.is_regular(corners)
+        if not regular:
+            return None
+        refined = cv2.cornerSubPix(gray, corners.copy(), SUBPIX_WINDOW, (-1,-1), self.criteria)
+        correction = np.linalg.norm((refined - corners).reshape(-1, 2), axis=1).max()
+        if correction > self.max_correction * spacing:
+            return None
+        return refined
+
+    def detect(self, gray):
+        corners = None
+        if self.prev_corners is not None:
+            corners = self.track(gray)
+            if corners is not None:
+                self.stats["tracked"] += 1
+            else:
+                self.stats["lost"] += 1
+        if corners is None:
+            corners = self.detector.detect(gray)
+            self.stats["searched"] += 1
+        if corners is None:
+            self.prev_gray, self.prev_corners = None, None
+        else:
+            self.prev_gray, self.prev_corners = gray, corners.astype(np.float32)
+        return corners
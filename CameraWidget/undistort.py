@@ -0,0 +1,144 @@
+import collections
+import hashlib
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from CameraWidget.preview import THUMBNAIL_HEIGHT, make_thumbnail
+
+# A pair of 4K maps takes about 50 MB, so only the most recent few are
+# kept, in memory and in a cache directory alike.
+MAX_CACHED_MAPS = 4
+
+_undistorters = collections.OrderedDict()
+_undistorters_lock = threading.Lock()
+
+def map_key(mtx, dist, size, alpha):
+    digest = hashlib.sha1()
+    for array in (mtx, dist):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    digest.update(f"{size[0]}x{size[1]}:{alpha}".encode())
+    return digest.hexdigest()
+
+class Undistorter:
+    '''
+    Undistorts frames of one size for one calibration with cv2.remap.
+
+    cv2.undistort builds its remap tables again on every call, which costs
+    more than the remap itself. The tables are built here once with
+    initUndistortRectifyMap, in the compact CV_16SC2 format. With a
+    cache_dir they are also stored as .npy files and memory-mapped on
+    later loads, so a new process does not build them again. Only the
+    MAX_CACHED_MAPS most recently used pairs are kept there.
+
+    alpha is passed to getOptimalNewCameraMatrix: 0 keeps only valid
+    pixels and 1 keeps every source pixel. With crop the result is cut to
+    the valid region that function reports.
+    '''
+    def __init__(self, mtx, dist, size, alpha=1.0, cache_dir=None):
+        width, height = size
+        self.size = (width, height)
+        self.new_mtx, self.roi = cv2.getOptimalNewCameraMatrix(mtx, dist, self.size, alpha, self.size)
+        self.key = map_key(mtx, dist, self.size, alpha)
+        maps = self.load(cache_dir) if cache_dir is not None else None
+        if maps is None:
+            maps = cv2.initUndistortRectifyMap(mtx, dist, None, self.new_mtx, self.size, cv2.CV_16SC2)
+            if cache_dir is not None:
+                self.save(cache_dir, maps)
+        self.map1, self.map2 = maps
+
+    def paths(self, cache_dir):
+        return [os.path.join(cache_dir, f"{self.key}.map{i}.npy") for i in (1, 2)]
+
+    def load(self, cache_dir):
+        paths = self.paths(cache_dir)
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        try:
+            maps = tuple(np.load(path, mmap_mode="r") for path in paths)
+            for path in paths:
+                os.utime(path)
+            return maps
+        except (OSError, ValueError):
+            return None
+
+    def save(self, cache_dir, maps):
+        os.makedirs(cache_dir, exist_ok=True)
+        for path, array in zip(self.paths(cache_dir), maps):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as map_file:
+                np.save(map_file, array)
+            os.replace(tmp_path, path)
+        self.prune(cache_dir)
+
+    def prune(self, cache_dir):
+        '''
+        Deletes all but the MAX_CACHED_MAPS most recently used pairs of maps.
+        '''
+        keys = []
+        for name in os.listdir(cache_dir):
+            if name.endswith(".map1.npy"):
+                try:
+                    keys.append((os.path.getmtime(os.path.join(cache_dir, name)), name[:-len(".map1.npy")]))
+                except OSError:
+                    pass
+        for _, key in sorted(keys, reverse=True)[MAX_CACHED_MAPS:]:
+            for i in (1, 2):
+                try:
+                    os.remove(os.path.join(cache_dir, f"{key}.map{i}.npy"))
+                except OSError:
+                    pass
+
+    def __call__(self, frame, crop=True):
+        height, width = frame.shape[:2]
+        if (width, height) != self.size:
+            raise ValueError(f"Frame is {width}x{height}, maps are for {self.size[0]}x{self.size[1]}")
+        undistorted = cv2.remap(frame, self.map1, self.map2, cv2.INTER_LINEAR)
+        if crop:
+            x, y, w, h = self.roi
+            if w > 0 and h > 0:
+                undistorted = undistorted[y:y+h, x:x+w]
+        return undistorted
+
+def get_undistorter(mtx, dist, size, alpha=1.0, cache_dir=None):
+    '''
+    Shared Undistorter for a calibration, frame size (width, height) and
+    alpha, built on first use and kept for the most recent few.
+    '''
+    key = map_key(mtx, dist, size, alpha)
+    with _undistorters_lock:
+        undistorter = _undistorters.get(key)
+        if undistorter is None:
+            undistorter = Undistorter(mtx, dist, size, alpha, cache_dir)
+            _undistorters[key] = undistorter
+            while len(_undistorters) > MAX_CACHED_MAPS:
+                _undistorters.popitem(last=False)
+        else:
+            _undistorters.move_to_end(key)
+        return undistorter
+
+def scaled_camera_matrix(mtx, scale_x, scale_y):
+    '''
+    Camera matrix for the same camera's images resized by scale_x and
+    scale_y, with pixel centres mapping onto pixel centres as cv2.resize
+    maps them.
+    '''
+    scaled = np.array(mtx, dtype=np.float64)
+    scaled[0, 0] *= scale_x
+    scaled[1, 1] *= scale_y
+    scaled[0, 2] = (scaled[0, 2] + 0.5) * scale_x - 0.5
+    scaled[1, 2] = (scaled[1, 2] + 0.5) * scale_y - 0.5
+    return scaled
+
+def undistort_thumbnail(frame, mtx, dist, height=THUMBNAIL_HEIGHT):
+    '''
+    Undistorted thumbnail of a frame. The frame is shrunk first and then
+    undistorted with maps built for the thumbnail's size, which take a few
+    kilobytes instead of the tens of megabytes full resolution maps do.
+    '''
+    thumbnail, _ = make_thumbnail(frame, height)
+    h, w = thumbnail.shape[:2]
+    mtx = scaled_camera_matrix(mtx, w / frame.shape[1], h / frame.shape[0])
+    return get_undistorter(mtx, dist, (w, h))(thumbnail)
@@ -0,0 +1,152 @@
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+# Codecs where every frame is a keyframe, so a seek never has to decode
+# anything but the target frame.
+INTRA_ONLY_CODECS = {"MJPG", "MJPA", "JPEG", "AVRN", "PNG ", "FFV1", "HFYU", "APCN", "APCH", "APCS", "APCO", "AP4H"}
+
+# Pixel formats whose first plane is 8-bit luma, one byte per pixel.
+LUMA_FORMATS = {"yuv420p", "yuvj420p", "yuv422p", "yuvj422p", "yuv444p", "yuvj444p", "yuv411p", "yuv440p", "nv12", "nv21", "gray"}
+
+class OpenCVReader:
+    '''
+    Reader backed by cv2.VideoCapture. Frames are always BGR, since OpenCV
+    offers no portable way to get at the decoder's luma plane.
+    '''
+    name = "opencv"
+
+    def __init__(self, filename, gray=False):
+        self.video_stream = cv2.VideoCapture(filename)
+        self.gray = False
+
+    def frame_count(self):
+        return int(self.video_stream.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def position(self):
+        return int(self.video_stream.get(cv2.CAP_PROP_POS_FRAMES))
+
+    def intra_only(self):
+        code = int(self.video_stream.get(cv2.CAP_PROP_FOURCC))
+        fourcc = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)).upper()
+        return fourcc in INTRA_ONLY_CODECS
+
+    def seek(self, index):
+        ok = self.video_stream.set(cv2.CAP_PROP_POS_FRAMES, index)
+        return ok and self.position() == index
+
+    def grab(self):
+        return self.video_stream.grab()
+
+    def read(self):
+        return self.video_stream.read()
+
+class PyAVReader:
+    '''
+    Reader backed by PyAV (FFmpeg). With gray it hands back the decoder's Y
+    plane as a NumPy view, with no colour conversion at all, which is all a
+    chessboard search needs.
+    '''
+    name = "pyav"
+
+    def __init__(self, filename, gray=False):
+        if av is None:
+            raise ImportError("The pyav video backend requires the av package")
+        self.container = av.open(filename)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.gray = gray
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 0.0
+        self.start_pts = self.stream.start_time or 0
+        self.frames = self.container.decode(self.stream)
+        self.pending = None
+        self.index = 0
+
+    def frame_count(self):
+        return self.stream.frames
+
+    def position(self):
+        return self.index
+
+    def intra_only(self):
+        return self.stream.codec_context.codec.intra_only
+
+    def frame_index(self, frame):
+        if frame.pts is None or not self.fps:
+            return None
+        return int(round(float((frame.pts - self.start_pts) * self.stream.time_base) * self.fps))
+
+    def seek(self, index):
+        if not self.fps:
+            return False
+        target = self.start_pts + int(index / self.fps / self.stream.time_base)
+        try:
+            self.container.seek(target, stream=self.stream, backward=True, any_frame=False)
+        except av.FFmpegError:
+            return False
+        self.frames = self.container.decode(self.stream)
+        self.pending = None
+        # Seeking lands on the keyframe before the target; decode forward.
+        for frame in self.frames:
+            position = self.frame_index(frame)
+            if position is None:
+                return False
+            if position >= index:
+                self.pending = frame
+                self.index = position
+                return position == index
+        self.index = index
+        return False
+
+    def next_frame(self):
+        if self.pending is not None:
+            frame, self.pending = self.pending, None
+            return frame
+        try:
+            return next(self.frames)
+        except (StopIteration, av.FFmpegError):
+            return None
+
+    def grab(self):
+        frame = self.next_frame()
+        if frame is None:
+            return False
+        self.index += 1
+        return True
+
+    def read(self):
+        frame = self.next_frame()
+        if frame is None:
+            return False, None
+        self.index += 1
+        if not self.gray:
+            return True, frame.to_ndarray(format="bgr24")
+        if frame.format.name in LUMA_FORMATS:
+            plane = frame.planes[0]
+            luma = np.frombuffer(plane, np.uint8).reshape(frame.height, plane.line_size)
+            return True, luma[:, :frame.width]
+        return True, frame.to_ndarray(format="gray")
+
+BACKENDS = {
+    OpenCVReader.name: OpenCVReader,
+    PyAVReader.name: PyAVReader,
+}
+
+def available_backends():
+    return [name for name in BACKENDS if name != PyAVReader.name or av is not None]
+
+def open_reader(filename, backend="auto", gray=False):
+    '''
+    Opens filename with the named backend. "auto" prefers PyAV when grayscale
+    frames are wanted and PyAV is installed, and OpenCV otherwise.
+    '''
+    if backend == "auto":
+        backend = PyAVReader.name if gray and av is not None else OpenCVReader.name
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown video backend: {backend}")
+    return BACKENDS[backend](filename, gray)
@@ -0,0 +1,161 @@
+import numpy as np
+
+GRID = (8, 8)
+ANGLE_BINS = 12
+TILT_BINS = 5
+SCALE_BINS = 4
+
+# Fewest views a calibration may be limited to. Fewer than this leave the
+# intrinsics and distortion underdetermined.
+MIN_VIEWS = 4
+
+def bin_index(values, low, high, bins):
+    scaled = (np.asarray(values) - low) / (high - low) * bins
+    return np.clip(scaled.astype(int), 0, bins - 1)
+
+def view_bins(imgpoints, shape, nx, ny, grid=GRID):
+    '''
+    Per view, the image cells its corners fall in as a (views, corners)
+    array of cell numbers, plus a list of (bin index array, bin count)
+    pairs for the board's in-plane angle, its perspective tilt along both
+    axes and its size.
+    '''
+    height, width = shape
+    corners = np.asarray(imgpoints, dtype=np.float64).reshape(len(imgpoints), -1, 2)
+
+    cols = np.clip((corners[..., 0] * grid[1] / width).astype(int), 0, grid[1] - 1)
+    rows = np.clip((corners[..., 1] * grid[0] / height).astype(int), 0, grid[0] - 1)
+
+    # Outer corners of the detected grid, which comes in ny rows of nx.
+    first, row_end = corners[:, 0], corners[:, nx - 1]
+    col_end, last = corners[:, -nx], corners[:, -1]
+    along = row_end - first
+    angle = np.arctan2(along[:, 1], along[:, 0])
+    edge = lambda a, b: np.linalg.norm(a - b, axis=1) + 1e-9
+    tilt_a = np.log(edge(first, row_end) / edge(col_end, last))
+    tilt_b = np.log(edge(first, col_end) / edge(row_end, last))
+    span = np.ptp(corners, axis=1)
+    size = span[:, 0] * span[:, 1] / (width * height)
+
+    pose = [
+        (bin_index(angle, -np.pi, np.pi, ANGLE_BINS), ANGLE_BINS),
+        (bin_index(tilt_a, -0.5, 0.5, TILT_BINS), TILT_BINS),
+        (bin_index(tilt_b, -0.5, 0.5, TILT_BINS), TILT_BINS),
+        (bin_index(np.sqrt(size), 0, 1, SCALE_BINS), SCALE_BINS),
+    ]
+    return rows * grid[1] + cols, pose
+
+def view_features(imgpoints, shape, nx, ny, grid=GRID):
+    '''
+    Boolean (views, features) matrix describing what each view contributes:
+    one column per image cell and one per pose bin (see view_bins).
+    '''
+    cell_ids, pose = view_bins(imgpoints, shape, nx, ny, grid)
+    views = len(cell_ids)
+    cells = np.zeros((views, grid[0] * grid[1]), dtype=bool)
+    cells[np.arange(views)[:, None], cell_ids] = True
+    blocks = [cells]
+    for index, bins in pose:
+        block = np.zeros((views, bins), dtype=bool)
+        block[np.arange(views), index] = True
+        blocks.append(block)
+    return np.hstack(blocks)
+
+def select_views(imgpoints, shape, nx, ny, max_views):
+    '''
+    Picks at most max_views diverse views by greedy weighted coverage.
+
+    Each pick takes the view whose features have been covered least so far,
+    with a feature's weight falling off as 1 / (1 + times covered). Once
+    every image cell and pose bin has been seen the selection keeps
+    spreading views evenly instead of piling onto the most common pose.
+    Returns the indices of the kept views in their original order. With
+    max_views None every view is kept; a limit below MIN_VIEWS is raised
+    to it.
+    '''
+    if max_views is not None:
+        max_views = max(max_views, MIN_VIEWS)
+    if max_views is None or len(imgpoints) <= max_views:
+        return list(range(len(imgpoints)))
+    features = view_features(imgpoints, shape, nx, ny).astype(np.float64)
+    counts = np.zeros(features.shape[1])
+    available = np.ones(len(features), dtype=bool)
+    selected = []
+    for _ in range(max_views):
+        gain = features @ (1 / (1 + counts))
+        gain[~available] = -1
+        best = int(np.argmax(gain))
+        selected.append(best)
+        available[best] = False
+        counts += features[best]
+    return sorted(selected)
+
+class CoverageMonitor:
+    '''
+    Tracks how much an incoming stream of views already covers, so that
+    detection can stop as soon as a calibration is well constrained.
+
+    Coverage is the fraction of image cells any corner has fallen in, and
+    pose diversity is the number of distinct (tilt, tilt, size) bins seen,
+    since in-plane rotation alone adds little to the intrinsics.
+    '''
+    def __init__(self, nx, ny, min_views=40, min_coverage=0.7, min_poses=10, grid=GRID):
+        self.nx = nx
+        self.ny = ny
+        self.min_views = min_views
+        self.min_coverage = min_coverage
+        self.min_poses = min_poses
+        self.grid = grid
+        self.views = 0
+        self.cells = np.zeros(grid[0] * grid[1], dtype=bool)
+        self.poses = set()
+
+    def add(self, corners, shape):
+        cell_ids, pose = view_bins([corners], shape, self.nx, self.ny, self.grid)
+        self.views += 1
+        self.cells[cell_ids[0]] = True
+        self.poses.add(tuple(int(index[0]) for index, _ in pose[1:]))
+
+    def coverage(self):
+        return self.cells.mean()
+
+    def satisfied(self):
+        return (
+            self.views >= self.min_views
+            and self.coverage() >= self.min_coverage
+            and len(self.poses) >= self.min_poses
+        )
+
+    def summary(self):
+        return f"{self.views} views, {self.coverage():.0%} image coverage, {len(self.poses)} distinct poses"
+
+class DuplicateFilter:
+    '''
+    Drops views that barely differ from a recently accepted one, such as
+    the hundreds of frames recorded while the board is held still.
+
+    A view is a duplicate when the mean displacement of its corners from
+    some accepted view is below min_motion pixels. The last window
+    accepted views are kept in one contiguous array, so each check is a
+    single vectorized comparison against all of them.
+    '''
+    def __init__(self, min_motion=2.0, window=200):
+        self.min_motion = min_motion
+        self.window = window
+        self.recent = None
+        self.accepted = 0
+        self.suppressed = 0
+
+    def accept(self, corners):
+        points = corners.reshape(-1, 2)
+        if self.recent is None:
+            self.recent = np.empty((self.window, len(points), 2), np.float32)
+        filled = min(self.accepted, self.window)
+        if filled:
+            motion = np.linalg.norm(self.recent[:filled] - points, axis=2).mean(axis=1)
+            if motion.min() < self.min_motion:
+                self.suppressed += 1
+                return False
+        self.recent[self.accepted % self.window] = points
+        self.accepted += 1
+        return True
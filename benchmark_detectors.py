@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+"""benchmark_detectors.py
+Compares the chessboard detector engines on frames sampled from a video and
+reports the one the "auto" engine setting would choose.
+
+Usage example:
+python benchmark_detectors.py -x 8 -y 6 -n 40 calib1.mp4 calib2.mov
+-x, --nx - interior corners per chessboard row
+-y, --ny - interior corners per chessboard column
+-s, --sample_rate - sample every nth frame, as CameraCalibration does (default 1)
+-n, --frames - frames to sample, spread over the video (default 20)
+--scale - coarse search scale (default 1.0)
+"""
+
+import argparse
+
+from CameraWidget.detector_benchmark import SAMPLE_FRAMES, benchmark_detectors, choose_detector, load_sample_frames
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chessboard detector engines.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("-x", "--nx", type=int, required=True)
+    parser.add_argument("-y", "--ny", type=int, required=True)
+    parser.add_argument("-s", "--sample_rate", type=int, default=1)
+    parser.add_argument("-n", "--frames", type=int, default=SAMPLE_FRAMES)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{'video':40} {'engine':8} {'found':>6} {'ms/frame':>9} {'residual':>9}")
+    for filename in args.videos:
+        frames = load_sample_frames(filename, args.sample_rate, args.frames)
+        results = benchmark_detectors(frames, args.nx, args.ny, scale=args.scale)
+        chosen = choose_detector(results)
+        for engine, result in results.items():
+            marker = " *" if engine == chosen else ""
+            print(f"{filename[-40:]:40} {engine:8} {result['found']:6d} {1000 * result['seconds']:9.1f} {result['residual']:9.3f}{marker}")
+
+if __name__ == "__main__":
+    main()
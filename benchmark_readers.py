@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""benchmark_readers.py
+Compares the video reader backends on the frames a detection pass decodes.
+
+Usage example:
+python benchmark_readers.py -s 30 -n 200 calib1.mp4 calib2.mov
+-s, --sample_rate - decode every nth frame, as CameraCalibration does (default 1)
+-n, --frames - stop after this many sampled frames, 0 for all (default 0)
+-b, --backends - backends to compare (default: all installed)
+"""
+
+import argparse
+import itertools
+import time
+
+from CameraWidget.detection import to_gray
+from CameraWidget.frame_sampler import FrameSampler, sample_indices
+from CameraWidget.video_reader import available_backends, open_reader
+
+def benchmark(filename, backend, sample_rate, max_frames):
+    start = time.perf_counter()
+    reader = open_reader(filename, backend, gray=True)
+    frame_indices = sample_indices(reader.frame_count(), sample_rate)
+    if max_frames:
+        frame_indices = itertools.islice(frame_indices, max_frames)
+    frames = 0
+    for _, frame in FrameSampler(reader, frame_indices):
+        # Time what detection actually receives: a grayscale image.
+        to_gray(frame)
+        frames += 1
+    return frames, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare video reader backends for calibration decoding.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("-s", "--sample_rate", type=int, default=1)
+    parser.add_argument("-n", "--frames", type=int, default=0)
+    parser.add_argument("-b", "--backends", nargs="+", default=available_backends())
+    args = parser.parse_args()
+
+    print(f"{'video':40} {'backend':8} {'frames':>7} {'seconds':>8} {'fps':>8}")
+    for filename in args.videos:
+        for backend in args.backends:
+            frames, seconds = benchmark(filename, backend, args.sample_rate, args.frames)
+            fps = frames / seconds if seconds else 0
+            print(f"{filename[-40:]:40} {backend:8} {frames:7d} {seconds:8.2f} {fps:8.1f}")
+
+if __name__ == "__main__":
+    main()
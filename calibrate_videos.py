@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+"""calibrate_videos.py
+Calibrates cameras from calibration videos without starting the GUI, and
+writes one JSON result file per video. Videos are calibrated in parallel,
+one process each, and the cores left over are split between them for
+chessboard detection.
+
+Usage example:
+python calibrate_videos.py -x 8 -y 6 -s 5 --distorted -o results cam1.mp4 cam2.mp4
+-x, --nx - interior corners per chessboard row
+-y, --ny - interior corners per chessboard column
+-s, --sample_rate - search every nth frame (default 1)
+-o, --output_dir - directory the <video name>.json results go to (default .)
+-j, --jobs - videos calibrated at once (default: one per core, at most one per video)
+-w, --workers - detection processes per video (default: the cores left per job)
+--distorted - also solve for lens distortion
+--rotate - rotate frames by any angle in degrees, as in the camera settings
+--v_flip, --h_flip - flip frames as in the camera settings
+--detector - chessboard detector engine, or auto (default classic)
+--scale - coarse search scale, from 0.05 to 1 (default 1.0)
+--max_views - views used to solve for distortion, at least 4 (default 60)
+--min_motion - minimum corner motion in px between views (default 2.0)
+--sharpness_filter, --tracking, --anytime - as in the camera settings
+--cache_dir - detection cache directory, or "none" to disable it
+
+Each result file holds the image size, camera matrix, distortion
+coefficients, RMS reprojection error, the number of views found and the
+frames used to solve. Exits with status 1 if any video failed.
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from CameraWidget.calibration_engine import CalibrationEngine
+from CameraWidget.detection import DETECTORS, MIN_SCALE
+from CameraWidget.detection_cache import CACHE_DIR
+from CameraWidget.view_selection import MIN_VIEWS
+
+# Seconds between detection progress lines for each video.
+PROGRESS_INTERVAL = 5
+
+def set_threads(threads):
+    # Jobs already run side by side, so OpenCV's own thread pool would
+    # only oversubscribe the cores.
+    cv2.setNumThreads(threads)
+
+def print_progress(name):
+    def progress(args):
+        percent, _, msg = args
+        if msg.startswith("Detecting calibration board"):
+            msg = f"Detecting calibration board, {percent}%"
+        print(f"{name}: {msg}", flush=True)
+    return progress
+
+def calibrate_video(filename, output_path, options):
+    name = os.path.basename(filename)
+    engine = CalibrationEngine(
+        filename,
+        progress=print_progress(name),
+        preview_fps=1 / PROGRESS_INTERVAL,
+        estimate_interval=0,
+        **options,
+    )
+    engine.run()
+    dataset = engine.get_calibration()
+    h, w = dataset.shape
+    result = {
+        "video": os.path.abspath(filename),
+        "image_size": [w, h],
+        "camera_matrix": dataset.mtx.tolist(),
+        "dist_coeffs": dataset.dist.ravel().tolist() if dataset.dist is not None else None,
+        "rms": dataset.rms,
+        "views": len(dataset),
+        "calibration_frames": dataset.calibration_frames,
+        "stop_reason": engine.stop_reason,
+    }
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w") as result_file:
+        json.dump(result, result_file, indent=2)
+    os.replace(tmp_path, output_path)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate cameras from calibration videos without the GUI.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("-x", "--nx", type=int, required=True)
+    parser.add_argument("-y", "--ny", type=int, required=True)
+    parser.add_argument("-s", "--sample_rate", type=int, default=1)
+    parser.add_argument("-o", "--output_dir", default=".")
+    parser.add_argument("-j", "--jobs", type=int)
+    parser.add_argument("-w", "--workers", type=int)
+    parser.add_argument("--distorted", action="store_true")
+    parser.add_argument("--rotate", type=int, default=0)
+    parser.add_argument("--v_flip", action="store_true")
+    parser.add_argument("--h_flip", action="store_true")
+    parser.add_argument("--detector", default="classic", choices=sorted(DETECTORS) + ["auto"])
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--max_views", type=int, default=60)
+    parser.add_argument("--min_motion", type=float, default=2.0)
+    parser.add_argument("--sharpness_filter", action="store_true")
+    parser.add_argument("--tracking", action="store_true")
+    parser.add_argument("--anytime", action="store_true")
+    parser.add_argument("--cache_dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    if not MIN_SCALE <= args.scale <= 1:
+        parser.error(f"--scale must be between {MIN_SCALE} and 1")
+    if args.max_views < MIN_VIEWS:
+        parser.error(f"--max_views must be at least {MIN_VIEWS}")
+    names = [os.path.splitext(os.path.basename(filename))[0] for filename in args.videos]
+    if len(set(names)) < len(names):
+        parser.error("videos must have distinct file names, their results are named after them")
+    cores = os.cpu_count() or 1
+    jobs = args.jobs or min(cores, len(args.videos))
+    threads = max(cores // jobs, 1)
+    options = dict(
+        nx=args.nx,
+        ny=args.ny,
+        rotate=args.rotate,
+        v_flip=args.v_flip,
+        h_flip=args.h_flip,
+        sample_rate=args.sample_rate,
+        distorted=args.distorted,
+        workers=args.workers or threads,
+        detection_scale=args.scale,
+        cache_dir=None if args.cache_dir.lower() == "none" else args.cache_dir,
+        max_views=args.max_views,
+        min_motion=args.min_motion,
+        tracking=args.tracking,
+        anytime=args.anytime,
+        detector_engine=args.detector,
+        sharpness_filter=args.sharpness_filter,
+    )
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(jobs, initializer=set_threads, initargs=(threads,)) as executor:
+        futures = {
+            executor.submit(
+                calibrate_video,
+                filename,
+                os.path.join(args.output_dir, f"{name}.json"),
+                options,
+            ): filename
+            for filename, name in zip(args.videos, names)
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            try:
+                result = future.result()
+            except Exception as error:
+                failed += 1
+                print(f"{filename}: failed: {error}", flush=True)
+                continue
+            rms = f"{result['rms']:.3f} px" if result["rms"] is not None else "n/a"
+            print(f"{filename}: focal length {result['camera_matrix'][0][0]:.1f} px from {result['views']} views, RMS {rms}", flush=True)
+    raise SystemExit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -54,8 +54,20 @@ class MainWindow(QMainWindow):
         add_btn = QPushButton("Add Camera")
         add_btn.pressed.connect(self.camera_list.add_camera)
         calib_btn = QPushButton("Calibrate Cameras")
+        calib_btn.pressed.connect(self.camera_list.calibrate_all)
+        rig_btn = QPushButton("Calibrate Rig")
+        rig_btn.pressed.connect(self.camera_list.calibrate_rig)
+        self.camera_list.rig_running.connect(rig_btn.setDisabled)
+        budget_label = QLabel("Worker budget")
+        budget_box = QSpinBox()
+        budget_box.setRange(1, 256)
+        budget_box.setValue(self.camera_list.scheduler.budget)
+        budget_box.valueChanged.connect(self.camera_list.scheduler.set_budget)
         btn_layout.addWidget(add_btn)
         btn_layout.addWidget(calib_btn)
+        btn_layout.addWidget(rig_btn)
+        btn_layout.addWidget(budget_label)
+        btn_layout.addWidget(budget_box)
 
         widget = QWidget()
         layout.addWidget(board_widget)
@@ -67,10 +79,21 @@ class MainWindow(QMainWindow):
     def update_board_config(self, config):
         self.camera_list.set_board_params(config)
 
-app = QApplication(sys.argv)
+    def closeEvent(self, event):
+        # Let running calibrations checkpoint before the app goes away.
+        self.camera_list.cancel_calibrations()
+        super().closeEvent(event)
 
-window = MainWindow()
+def main():
+    app = QApplication(sys.argv)
 
-window.show()
+    window = MainWindow()
 
-app.exec()
+    window.show()
+
+    app.exec()
+
+# Detection worker processes are spawned, and spawning imports this module
+# again in each of them.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import cv2
+import numpy as np
+import pytest
+
+NX, NY = 8, 6
+
+@pytest.fixture
+def objp():
+    points = np.zeros((NX * NY, 3), np.float32)
+    points[:, :2] = np.mgrid[0:NX, 0:NY].T.reshape(-1, 2)
+    return points
+
+@pytest.fixture
+def mtx():
+    return np.array([[620.0, 0, 318.0], [0, 615.0, 242.0], [0, 0, 1]])
+
+@pytest.fixture
+def board_views(objp, mtx):
+    '''
+    A function projecting the board through mtx and dist in count random
+    poses that keep it in a 640x480 frame. Returns rvecs, tvecs and the
+    (count, corners, 2) image points.
+    '''
+    def views(count, dist=None, seed=0):
+        rng = np.random.default_rng(seed)
+        centre = objp.mean(axis=0)
+        rvecs, tvecs, points = [], [], []
+        while len(points) < count:
+            rvec = rng.normal(0, 0.35, 3)
+            R = cv2.Rodrigues(rvec)[0]
+            tvec = np.array([rng.uniform(-2, 2), rng.uniform(-1.5, 1.5), rng.uniform(12, 18)]) - R @ centre
+            projected, _ = cv2.projectPoints(objp, rvec, tvec, mtx, dist if dist is not None else np.zeros(5))
+            projected = projected.reshape(-1, 2)
+            if np.any(projected < 0) or np.any(projected >= [640, 480]):
+                continue
+            rvecs.append(rvec)
+            tvecs.append(tvec)
+            points.append(projected)
+        return np.array(rvecs), np.array(tvecs), np.array(points, dtype=np.float32)
+    return views
+
+@pytest.fixture
+def render_board():
+    '''
+    A function drawing a chessboard with NX by NY interior corners into a
+    grayscale frame, turned by angle degrees about the frame centre and
+    shifted by offset. Returns the frame and the true corners (N, 1, 2).
+    '''
+    def render(shape=(480, 640), square=36, angle=0.0, offset=(0.0, 0.0)):
+        height, width = shape
+        board_w, board_h = (NX + 1) * square, (NY + 1) * square
+        texture = np.full((height, width), 255, np.uint8)
+        x0, y0 = (width - board_w) // 2, (height - board_h) // 2
+        for row in range(NY + 1):
+            for col in range(NX + 1):
+                if (row + col) % 2 == 0:
+                    x, y = x0 + col * square, y0 + row * square
+                    texture[y:y + square, x:x + square] = 0
+        corners = np.mgrid[1:NX + 1, 1:NY + 1].T.reshape(-1, 2) * square + [x0, y0] - 0.5
+        M = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        M[:, 2] += offset
+        frame = cv2.warpAffine(texture, M, (width, height), flags=cv2.INTER_LINEAR, borderValue=255)
+        corners = corners @ M[:, :2].T + M[:, 2]
+        return frame, corners.reshape(-1, 1, 2).astype(np.float32)
+    return render
+
+@pytest.fixture
+def write_board_video(tmp_path, render_board):
+    '''
+    A function writing an MJPG video of the board drifting across the
+    frame, with every blank_every-th frame blank and, with blur_every,
+    every blur_every-th board frame blurred. Returns its path and the true
+    corners of each 1-based frame number that shows the board.
+    '''
+    def write(frames=30, blank_every=5, blur_every=None, name="board.avi"):
+        path = str(tmp_path / name)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (640, 480))
+        truth = {}
+        for nth_frame in range(1, frames + 1):
+            if nth_frame % blank_every == 0:
+                frame = np.full((480, 640), 255, np.uint8)
+            else:
+                step = nth_frame % 30
+                frame, truth[nth_frame] = render_board(angle=step, offset=(2.0 * step - 30, step - 15))
+                if blur_every and nth_frame % blur_every == 0:
+                    frame = cv2.GaussianBlur(frame, (0, 0), 4)
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+        writer.release()
+        return path, truth
+    return write
+
+@pytest.fixture
+def board_video(write_board_video):
+    '''
+    A 30 frame video from write_board_video with every fifth frame blank.
+    '''
+    return write_board_video()
+
+@pytest.fixture
+def synthetic_rig(objp):
+    '''
+    A function building the CalibrationDatasets of a rig of cameras
+    spread on an arc, all watching the board move through frames poses.
+    Even cameras have lens distortion, and every fourth view of every
+    third camera lists its corners in reverse. With perturb each dataset's
+    intrinsics are a little off. Returns the datasets and the true (mtx,
+    dist) of each camera and its (R, t) relative to camera 0.
+    '''
+    from CameraWidget.dataset import CalibrationDataset
+
+    def rig(cameras=3, frames=40, noise=0.2, perturb=False, seed=2):
+        rng = np.random.default_rng(seed)
+        intrinsics, poses = [], []
+        for camera in range(cameras):
+            focal = rng.uniform(550, 800)
+            mtx = np.array([[focal, 0, rng.uniform(300, 340)], [0, focal * rng.uniform(0.99, 1.01), rng.uniform(220, 260)], [0, 0, 1]])
+            dist = np.array([rng.uniform(-0.15, 0.1), rng.uniform(-0.05, 0.1), 0.001, -0.001, 0]) if camera % 2 == 0 else np.zeros(5)
+            intrinsics.append((mtx, dist))
+            angle = 0.5 * np.pi * camera / cameras - 0.4
+            R = cv2.Rodrigues(np.array([0, angle, 0]))[0]
+            poses.append((R, -R @ np.array([16 * np.sin(angle), 0, 16 - 16 * np.cos(angle)])))
+
+        datasets = []
+        for mtx, dist in intrinsics:
+            dataset = CalibrationDataset(objp)
+            dataset.shape = (480, 640)
+            dataset.mtx = mtx.copy()
+            dataset.dist = dist.copy()
+            if perturb:
+                dataset.mtx[0, 0] *= 1.01
+                dataset.mtx[1, 1] *= 0.99
+                dataset.mtx[0, 2] += 3
+                dataset.dist *= 1.1
+            datasets.append(dataset)
+
+        centre = objp.mean(axis=0)
+        for nth_frame in range(frames):
+            R_b = cv2.Rodrigues(rng.normal(0, 0.3, 3))[0]
+            t_b = np.array([rng.uniform(-2, 2), rng.uniform(-1.5, 1.5), rng.uniform(14, 18)]) - R_b @ centre
+            for camera, ((mtx, dist), (R, t)) in enumerate(zip(intrinsics, poses)):
+                projected, _ = cv2.projectPoints(objp, cv2.Rodrigues(R @ R_b)[0], R @ t_b + t, mtx, dist)
+                projected = projected.reshape(-1, 2)
+                if np.any(projected < 0) or np.any(projected >= [640, 480]):
+                    continue
+                projected += rng.normal(0, noise, projected.shape)
+                if camera % 3 == 1 and nth_frame % 4 == 0:
+                    projected = projected[::-1]
+                datasets[camera].detections[nth_frame] = projected.astype(np.float32).reshape(-1, 1, 2)
+
+        R_0, t_0 = poses[0]
+        extrinsics = [(R @ R_0.T, (t - R @ R_0.T @ t_0).reshape(3, 1)) for R, t in poses]
+        return datasets, intrinsics, extrinsics
+    return rig
@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+import pytest
+
+from CameraWidget.bundle_adjustment import CAMERA, INTRINSICS, POSE, BundleAdjustment, bundle_adjust, intrinsics_vector, project
+from CameraWidget.rig_calibration import calibrate_rig
+
+@pytest.fixture
+def rig(synthetic_rig):
+    datasets, intrinsics, extrinsics = synthetic_rig(cameras=3, frames=30, perturb=True)
+    return calibrate_rig(datasets, 8, 6), intrinsics, extrinsics
+
+def parameters(seed=0):
+    rng = np.random.default_rng(seed)
+    intrinsics = np.array([
+        intrinsics_vector(np.array([[600.0, 0, 320], [0, 610, 240], [0, 0, 1]]), [-0.2, 0.05, 0.002, -0.001, 0.01]),
+        intrinsics_vector(np.array([[700.0, 0, 330], [0, 690, 250], [0, 0, 1]]), None),
+    ])
+    cameras = np.hstack([rng.normal(0, 0.2, (2, 3)), rng.normal(0, 0.5, (2, 3))])
+    boards = np.hstack([rng.normal(0, 0.4, (3, 3)), rng.normal(0, 1, (3, 3)) + [-3, -2, 15]])
+    return intrinsics, cameras, boards
+
+def test_project_matches_opencv(objp):
+    objp = objp.astype(np.float64)
+    intrinsics, cameras, boards = parameters()
+    camera_index, board_index = np.array([0, 1, 0, 1]), np.array([0, 0, 2, 1])
+    projected = project(objp, intrinsics, cameras, boards, camera_index, board_index)
+    for points, camera, board in zip(projected, camera_index, board_index):
+        R_c, R_b = cv2.Rodrigues(cameras[camera, :3])[0], cv2.Rodrigues(boards[board, :3])[0]
+        fx, fy, cx, cy = intrinsics[camera, :4]
+        mtx = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]])
+        expected, _ = cv2.projectPoints(objp, cv2.Rodrigues(R_c @ R_b)[0], R_c @ boards[board, 3:] + cameras[camera, 3:], mtx, intrinsics[camera, 4:])
+        np.testing.assert_allclose(points, expected.reshape(-1, 2), atol=1e-8)
+
+def test_jacobian_matches_finite_differences(objp):
+    objp = objp.astype(np.float64)
+    intrinsics, cameras, boards = parameters(1)
+    camera_index, board_index = np.array([0, 1]), np.array([2, 1])
+    _, J = project(objp, intrinsics, cameras, boards, camera_index, board_index, jacobian=True)
+    step = 1e-6
+    for o, (camera, board) in enumerate(zip(camera_index, board_index)):
+        for k in range(INTRINSICS + 2 * POSE):
+            changed = [intrinsics.copy(), cameras.copy(), boards.copy()]
+            if k < INTRINSICS:
+                target = changed[0][camera], k
+            elif k < CAMERA:
+                target = changed[1][camera], k - INTRINSICS
+            else:
+                target = changed[2][board], k - CAMERA
+            array, index = target
+            array[index] += step
+            plus = project(objp, *changed, camera_index[o:o + 1], board_index[o:o + 1])[0]
+            array[index] -= 2 * step
+            minus = project(objp, *changed, camera_index[o:o + 1], board_index[o:o + 1])[0]
+            numeric = (plus - minus) / (2 * step)
+            scale = max(np.abs(numeric).max(), 1)
+            assert np.abs(J[o, ..., k] - numeric).max() < 1e-5 * scale, k
+
+def test_schur_step_matches_the_dense_solve(rig):
+    rig, _, _ = rig
+    adjustment = BundleAdjustment(rig, chunk_size=7)
+    cameras, boards = len(adjustment.camera_ids), len(adjustment.frames)
+    projected, J = project(adjustment.objp, adjustment.intrinsics, adjustment.poses, adjustment.boards, adjustment.camera_index, adjustment.board_index, jacobian=True)
+    rows = J.shape[1] * 2
+    dense = np.zeros((len(J) * rows, cameras * CAMERA + boards * POSE))
+    for o, (camera, board) in enumerate(zip(adjustment.camera_index, adjustment.board_index)):
+        block = J[o].reshape(rows, -1)
+        dense[o * rows:(o + 1) * rows, camera * CAMERA:(camera + 1) * CAMERA] = block[:, :CAMERA] * adjustment.free[camera]
+        dense[o * rows:(o + 1) * rows, cameras * CAMERA + board * POSE:][:, :POSE] = block[:, CAMERA:]
+    r = (projected - adjustment.corners).ravel()
+    damping = 0.1
+    H = dense.T @ dense
+    H[np.diag_indices_from(H)] *= 1 + damping
+    H[np.diag_indices(cameras * CAMERA)] += ~adjustment.free.ravel()
+    expected = np.linalg.solve(H, -dense.T @ r)
+
+    step_cameras, step_boards = adjustment.solve(adjustment.normal_equations(), damping)
+    np.testing.assert_allclose(np.concatenate([step_cameras.ravel(), step_boards.ravel()]), expected, rtol=1e-6, atol=1e-9)
+    # Fixed parameters do not move.
+    assert not np.any(step_cameras[~adjustment.free])
+
+def test_bundle_adjust_recovers_the_intrinsics(rig):
+    rig, intrinsics, extrinsics = rig
+    seeded = rig.rms
+    messages = []
+    iterations = bundle_adjust(rig, progress=messages.append)
+    assert 0 < iterations <= 50 and len(messages) == iterations
+    assert rig.rms < 0.5 * seeded
+    assert rig.rms == pytest.approx(rig.residual())
+    # The seed's focal lengths are 1% off and its principal points 3 px.
+    for camera, (mtx, dist) in enumerate(intrinsics):
+        fitted = rig.cameras[camera][0]
+        assert abs(fitted[0, 0] / mtx[0, 0] - 1) < 0.002
+        assert abs(fitted[1, 1] / mtx[1, 1] - 1) < 0.002
+        assert abs(fitted[0, 2] - mtx[0, 2]) < 2.5
+    for camera in (1, 2):
+        R, t = rig.extrinsics[camera]
+        R_true, t_true = extrinsics[camera]
+        assert np.degrees(np.arccos(np.clip((np.trace(R @ R_true.T) - 1) / 2, -1, 1))) < 0.2
+        assert np.linalg.norm(t - t_true) < 0.1
+
+def test_fixed_intrinsics_stay_put(rig):
+    rig, _, _ = rig
+    before = [(mtx.copy(), np.ravel(dist).copy()) for mtx, dist in rig.cameras]
+    bundle_adjust(rig, fix_intrinsics=True, max_iterations=5)
+    for (mtx, dist), (fitted, fitted_dist) in zip(before, rig.cameras):
+        np.testing.assert_allclose(fitted, mtx)
+        np.testing.assert_allclose(np.ravel(fitted_dist), dist)
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_cli(*args):
+    return subprocess.run(
+        [sys.executable, os.path.join(ROOT, "calibrate_videos.py"), *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+@pytest.mark.parametrize("rotate", ["0", "15"])
+def test_calibrates_a_video(board_video, tmp_path, rotate):
+    path, truth = board_video
+    result = run_cli("-x", "8", "-y", "6", "-w", "1", "--rotate", rotate, "--cache_dir", "none", "-o", str(tmp_path), path)
+    assert result.returncode == 0, result.stderr
+    assert "board.avi: Computing intrinsic properties" in result.stdout
+    with open(tmp_path / "board.json") as result_file:
+        calibration = json.load(result_file)
+    assert calibration["video"] == os.path.abspath(path)
+    assert calibration["views"] == len(truth)
+    assert len(calibration["camera_matrix"]) == 3
+    assert calibration["dist_coeffs"] is None
+    if rotate == "0":
+        assert calibration["image_size"] == [640, 480]
+
+def test_failed_video_sets_the_exit_status(tmp_path):
+    blank = tmp_path / "blank.avi"
+    blank.write_bytes(b"not a video")
+    result = run_cli("-x", "8", "-y", "6", "--cache_dir", "none", "-o", str(tmp_path), str(blank))
+    assert result.returncode == 1
+    assert "failed" in result.stdout
+
+@pytest.mark.parametrize("option", [["--scale", "0"], ["--max_views", "0"]])
+def test_rejects_out_of_range_options(tmp_path, option):
+    result = run_cli("-x", "8", "-y", "6", *option, str(tmp_path / "board.avi"))
+    assert result.returncode == 2
+    assert option[0] in result.stderr
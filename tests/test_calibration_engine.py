@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from CameraWidget.calibration_engine import CalibrationEngine
+
+def make_engine(path, messages, **kwargs):
+    options = dict(
+        nx=8,
+        ny=6,
+        rotate=0,
+        v_flip=False,
+        h_flip=False,
+        sample_rate=1,
+        distorted=False,
+        cache_dir=None,
+        estimate_interval=0,
+        video_backend="opencv",
+        min_motion=0,
+        progress=lambda args: messages.append(args[2]),
+    )
+    options.update(kwargs)
+    return CalibrationEngine(path, **options)
+
+def test_anytime_turns_tracking_off(board_video):
+    messages = []
+    engine = make_engine(board_video[0], messages, anytime=True, tracking=True, min_views=1, min_coverage=0, min_poses=1)
+    engine.run()
+    assert not engine.tracking
+    assert "Corner tracking is off in anytime mode" in messages
+    assert engine.stop_reason.startswith("Stopped after 1 of 30 frames")
+
+def test_pooled_and_serial_runs_skip_the_same_blurred_frames(write_board_video):
+    # Long enough for several detection pool chunks.
+    path, truth = write_board_video(frames=100, blank_every=50, blur_every=3)
+    runs = []
+    for workers in (1, 2):
+        engine = make_engine(path, [], workers=workers, sharpness_filter=True)
+        engine.run()
+        runs.append((engine.skipped, sorted(engine.get_calibration().detections)))
+    assert runs[0] == runs[1]
+    skipped, detected = runs[0]
+    assert skipped >= 30
+    assert not any(nth_frame % 3 == 0 for nth_frame in detected)
+
+def record_searches(engine):
+    '''
+    Records the frame numbers each detection pass of engine is asked to
+    decode and search.
+    '''
+    requested = []
+    serial, parallel = engine.detect_chessboard, engine.detect_chessboard_parallel
+    def detect_chessboard(reader, frame_indices, gate=None):
+        frame_indices = list(frame_indices)
+        requested.append(frame_indices)
+        return serial(reader, frame_indices, gate)
+    def detect_chessboard_parallel(frame_indices, gate=None):
+        frame_indices = list(frame_indices)
+        requested.append(frame_indices)
+        return parallel(frame_indices, gate)
+    engine.detect_chessboard = detect_chessboard
+    engine.detect_chessboard_parallel = detect_chessboard_parallel
+    return requested
+
+def cancel_after(engine, frames, messages):
+    def progress(args):
+        messages.append(args[2])
+        if sum(msg.startswith("Detecting") for msg in messages) == frames:
+            engine.cancel()
+    engine.progress = progress
+
+def assert_same_calibration(a, b):
+    assert sorted(a.detections) == sorted(b.detections)
+    for nth_frame, corners in a.detections.items():
+        np.testing.assert_allclose(corners, b.detections[nth_frame], atol=1e-4)
+    np.testing.assert_array_equal(a.frames, b.frames)
+    np.testing.assert_allclose(a.mtx, b.mtx, rtol=1e-6)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cancel_checkpoints_and_resume_searches_only_the_rest(board_video, tmp_path, workers):
+    path, truth = board_video
+    messages = []
+    engine = make_engine(path, messages, workers=workers, cache_dir=str(tmp_path / "cache"), preview_fps=0)
+    cancel_after(engine, 8, messages)
+    engine.run()
+    assert engine.cancelled
+    assert engine.stop_reason.startswith("Cancelled after 9 of 30 frames")
+    assert engine.get_calibration().mtx is None
+    shape, analyzed, detections, _ = engine.get_cache().load()
+    assert shape == (480, 640)
+    assert len(analyzed) == 9
+    assert sorted(detections) == sorted(set(truth) & analyzed)
+
+    messages = []
+    resumed = make_engine(path, messages, workers=workers, cache_dir=str(tmp_path / "cache"))
+    requested = record_searches(resumed)
+    resumed.run()
+    assert "Reusing 9 previously searched frames" in messages
+    assert requested == [sorted(set(range(1, 31)) - analyzed)]
+    assert not resumed.cancelled
+
+    uninterrupted = make_engine(path, [], workers=workers)
+    uninterrupted.run()
+    assert_same_calibration(resumed.get_calibration(), uninterrupted.get_calibration())
+    # Everything searched is checkpointed once the run ends.
+    assert resumed.get_cache().load()[1] == set(range(1, 31))
+
+def test_checkpoints_are_written_while_searching(board_video, tmp_path, monkeypatch):
+    engine = make_engine(board_video[0], [], cache_dir=str(tmp_path), checkpoint_interval=1e-9)
+    sizes = []
+    checkpoint = engine.checkpoint
+    monkeypatch.setattr(engine, "checkpoint", lambda analyzed, *args: (sizes.append(len(analyzed)), checkpoint(analyzed, *args)))
+    engine.run()
+    assert sizes[:3] == [1, 2, 3]
+    assert sizes[-1] == 30
+
+def test_finer_sample_rate_reuses_cached_detections(board_video, tmp_path):
+    path, truth = board_video
+    coarse = make_engine(path, [], sample_rate=3, cache_dir=str(tmp_path))
+    coarse.run()
+    assert list(coarse.get_calibration().frames) == [nth_frame for nth_frame in sorted(truth) if nth_frame % 3 == 0]
+
+    messages = []
+    fine = make_engine(path, messages, sample_rate=1, cache_dir=str(tmp_path))
+    requested = record_searches(fine)
+    fine.run()
+    assert "Reusing 10 previously searched frames" in messages
+    assert requested == [[nth_frame for nth_frame in range(1, 31) if nth_frame % 3 != 0]]
+    assert list(fine.get_calibration().frames) == sorted(truth)
+
+def test_detector_settings_invalidate_the_cache(board_video, tmp_path):
+    path, _ = board_video
+    make_engine(path, [], cache_dir=str(tmp_path)).run()
+    messages = []
+    rescaled = make_engine(path, messages, cache_dir=str(tmp_path), detection_scale=0.5)
+    requested = record_searches(rescaled)
+    rescaled.run()
+    assert not any(msg.startswith("Reusing") for msg in messages)
+    assert requested == [list(range(1, 31))]
@@ -0,0 +1,107 @@
+import cv2
+import pytest
+
+from CameraWidget.calibration_scheduler import BATCH, INTERACTIVE, CalibrationScheduler
+
+class FakeWidget:
+    def __init__(self, name, cost=1, started=None, fail=False):
+        self.name = name
+        self.cost = cost
+        self.started = started
+        self.fail = fail
+        self.queued = 0
+
+    def calibration_cost(self):
+        return self.cost
+
+    def calibration_queued(self):
+        self.queued += 1
+
+    def start_calibration(self):
+        if self.fail:
+            raise RuntimeError(f"{self.name} could not start")
+        self.started.append(self.name)
+
+    def __repr__(self):
+        return self.name
+
+@pytest.fixture
+def started():
+    threads = cv2.getNumThreads()
+    yield []
+    cv2.setNumThreads(threads)
+
+def test_budget_limits_running_jobs(started):
+    scheduler = CalibrationScheduler(budget=4)
+    widgets = [FakeWidget(name, 2, started) for name in "abc"]
+    for widget in widgets:
+        scheduler.submit(widget, BATCH)
+    assert started == ["a", "b"]
+    assert cv2.getNumThreads() == 2
+    scheduler.job_finished(widgets[0])
+    assert started == ["a", "b", "c"]
+    scheduler.job_finished(widgets[1])
+    scheduler.job_finished(widgets[2])
+    assert not scheduler.running and cv2.getNumThreads() == 4
+
+def test_oversized_job_runs_alone(started):
+    scheduler = CalibrationScheduler(budget=2)
+    big, small = FakeWidget("big", 8, started), FakeWidget("small", 1, started)
+    scheduler.submit(big, BATCH)
+    scheduler.submit(small, BATCH)
+    assert started == ["big"]
+    scheduler.job_finished(big)
+    assert started == ["big", "small"]
+
+def test_priority_then_submission_order(started):
+    scheduler = CalibrationScheduler(budget=1)
+    running, a, b, c = (FakeWidget(name, 1, started) for name in ("running", "a", "b", "c"))
+    scheduler.submit(running, BATCH)
+    scheduler.submit(a, BATCH)
+    scheduler.submit(b, BATCH)
+    scheduler.submit(c, INTERACTIVE)
+    # Submitting again at a higher priority moves a queued job up, while
+    # a lower priority or a running job is ignored.
+    scheduler.submit(b, INTERACTIVE)
+    scheduler.submit(c, BATCH)
+    scheduler.submit(running, INTERACTIVE)
+    assert (a.queued, b.queued, c.queued) == (1, 2, 1)
+    for widget in (running, c, b):
+        scheduler.job_finished(widget)
+    assert started == ["running", "c", "b", "a"]
+
+def test_cancel(started):
+    scheduler = CalibrationScheduler(budget=1)
+    a, b = FakeWidget("a", 1, started), FakeWidget("b", 1, started)
+    scheduler.submit(a)
+    scheduler.submit(b)
+    assert scheduler.cancel(b)
+    assert not scheduler.cancel(b)
+    assert not scheduler.cancel(a)
+    scheduler.job_finished(a)
+    assert started == ["a"]
+    assert not scheduler.queue
+
+def test_failed_start_releases_the_budget(started):
+    scheduler = CalibrationScheduler(budget=1)
+    running = FakeWidget("running", 1, started)
+    broken = FakeWidget("broken", 1, started, fail=True)
+    after = FakeWidget("after", 1, started)
+    scheduler.submit(running)
+    scheduler.submit(broken)
+    scheduler.submit(after)
+    with pytest.raises(RuntimeError, match="broken"):
+        scheduler.job_finished(running)
+    assert started == ["running", "after"]
+    assert list(scheduler.running) == [after]
+    assert not scheduler.queue
+
+def test_set_budget_starts_waiting_jobs(started):
+    scheduler = CalibrationScheduler(budget=1)
+    a, b = FakeWidget("a", 1, started), FakeWidget("b", 1, started)
+    scheduler.submit(a)
+    scheduler.submit(b)
+    scheduler.set_budget(0)
+    assert scheduler.budget == 1 and started == ["a"]
+    scheduler.set_budget(2)
+    assert started == ["a", "b"]
@@ -0,0 +1,47 @@
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+from PySide6.QtWidgets import QApplication
+
+from CameraWidget.camera_config import CameraConfig
+from CameraWidget.detection import MIN_SCALE
+from CameraWidget.view_selection import MIN_VIEWS
+
+CONFIG = {
+    "name": "Camera 1",
+    "rotation": 0,
+    "v_flip": False,
+    "h_flip": False,
+    "reorient_corners": False,
+    "distorted": False,
+    "video_file": "",
+    "sample_rate": 1,
+    "workers": 1,
+    "detection_scale": 1.0,
+    "max_views": 60,
+    "min_motion": 2.0,
+    "detector": "classic",
+    "sharpness_filter": False,
+    "tracking": False,
+    "anytime": False,
+}
+
+@pytest.fixture
+def camera_config():
+    app = QApplication.instance() or QApplication([])
+    return CameraConfig(dict(CONFIG))
+
+def test_round_trip(camera_config):
+    assert camera_config.get_config() == CONFIG
+
+@pytest.mark.parametrize("text, scale", [("0", MIN_SCALE), ("0.5", 0.5), ("3", 1.0), ("", 1.0)])
+def test_detection_scale_is_clamped(camera_config, text, scale):
+    camera_config.detection_scale_input.setText(text)
+    assert camera_config.get_config()["detection_scale"] == scale
+
+@pytest.mark.parametrize("text, views", [("0", MIN_VIEWS), ("1", MIN_VIEWS), ("25", 25), ("", 60)])
+def test_max_views_is_at_least_min_views(camera_config, text, views):
+    camera_config.max_views_input.setText(text)
+    assert camera_config.get_config()["max_views"] == views
@@ -0,0 +1,36 @@
+import numpy as np
+
+from CameraWidget.dataset import CalibrationDataset
+
+def test_append_grows_past_capacity(objp, board_views):
+    _, _, points = board_views(10)
+    dataset = CalibrationDataset(objp, capacity=3)
+    for nth_frame, corners in enumerate(points):
+        dataset.append(10 * nth_frame, corners.reshape(-1, 1, 2))
+    assert len(dataset) == 10
+    np.testing.assert_array_equal(dataset.points, points)
+    np.testing.assert_array_equal(dataset.frames, np.arange(0, 100, 10))
+    assert dataset.points.dtype == np.float32 and dataset.points.flags.c_contiguous
+
+def test_reserve_keeps_the_views(objp, board_views):
+    _, _, points = board_views(2)
+    dataset = CalibrationDataset(objp, capacity=0)
+    dataset.append(1, points[0])
+    dataset.reserve(100)
+    dataset.reserve(10)
+    dataset.append(2, points[1])
+    assert len(dataset._frames) == 100
+    np.testing.assert_array_equal(dataset.points, points)
+
+def test_opencv_lists_are_views(objp, board_views):
+    _, _, points = board_views(4)
+    dataset = CalibrationDataset(objp)
+    for nth_frame, corners in enumerate(points):
+        dataset.append(nth_frame, corners)
+    imgpoints = dataset.imgpoints()
+    assert len(imgpoints) == 4 and imgpoints[0].shape == (len(objp), 1, 2)
+    assert all(np.shares_memory(view, dataset.points) for view in imgpoints)
+    np.testing.assert_array_equal(dataset.imgpoints([3, 1])[0].reshape(-1, 2), points[3])
+    objpoints = dataset.objpoints()
+    assert len(objpoints) == 4 and all(view is dataset.objp for view in objpoints)
+    assert len(dataset.objpoints(2)) == 2
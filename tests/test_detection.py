@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from CameraWidget.detection import ChessboardDetector, SectorDetector, detect_oriented, make_detector
+from CameraWidget.reorient import Reorienter
+
+def test_finds_rendered_board(render_board):
+    frame, corners = render_board(angle=12, offset=(7.3, -4.6))
+    found = ChessboardDetector(8, 6).detect(frame)
+    assert np.abs(found - corners).max() < 0.2
+
+@pytest.mark.parametrize("scale, shape, square", [(0.5, (480, 640), 36), (0.25, (960, 1280), 80)])
+def test_coarse_to_fine_finds_the_board_at_full_accuracy(render_board, scale, shape, square):
+    frame, corners = render_board(shape, square, angle=-8, offset=(3.2, 5.1))
+    found = ChessboardDetector(8, 6, scale=scale).detect(frame)
+    assert np.abs(found - corners).max() < 0.2
+
+@pytest.mark.parametrize("scale", [1.0, 0.5])
+def test_sector_detector_finds_rendered_board(render_board, scale):
+    frame, corners = render_board(angle=-12, offset=(4.4, 2.7))
+    detector = make_detector("sb", 8, 6, scale=scale)
+    assert isinstance(detector, SectorDetector)
+    found = detector.detect(frame)
+    # The sector search may start from either end of the grid.
+    error = min(np.abs(found - corners).max(), np.abs(found[::-1] - corners).max())
+    assert error < 0.2
+
+def test_unknown_detector_engine():
+    with pytest.raises(ValueError):
+        make_detector("nope", 8, 6)
+
+def test_frame_without_board(render_board):
+    frame = np.full((480, 640), 128, np.uint8)
+    assert ChessboardDetector(8, 6).detect(frame) is None
+    assert ChessboardDetector(8, 6, scale=0.5).detect(frame) is None
+
+@pytest.mark.parametrize("rotate, v_flip, h_flip", [(90, False, False), (180, True, False), (270, False, True), (15, False, False)])
+def test_reoriented_corners_match_a_search_of_the_reoriented_frame(render_board, rotate, v_flip, h_flip):
+    frame, _ = render_board(angle=5, offset=(2.5, -1.5))
+    reorienter = Reorienter(rotate, v_flip, h_flip)
+    detector = ChessboardDetector(8, 6)
+    searched, shape, corners, score = detect_oriented(detector, reorienter, frame)
+    _, mapped_shape, mapped, _ = detect_oriented(detector, reorienter, frame, reorient_corners=True)
+    assert shape == mapped_shape == searched.shape
+    assert score is None
+    # Either search may list the corners from the other end.
+    error = min(np.abs(mapped - corners).max(), np.abs(mapped[::-1] - corners).max())
+    assert error < (0.1 if rotate % 90 == 0 else 0.3)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from CameraWidget.detection_cache import DetectionCache
+
+PARAMS = {"nx": 8, "ny": 6, "scale": 1.0, "engine": "classic"}
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 64)
+    return str(path)
+
+def corners(seed):
+    return np.random.default_rng(seed).uniform(0, 640, (48, 1, 2)).astype(np.float32)
+
+def test_round_trip(video, tmp_path):
+    detections = {3: corners(0), 9: corners(1)}
+    scores = {3: 120.5, 6: 12.0, 9: 98.25}
+    DetectionCache(video, PARAMS, str(tmp_path)).save((480, 640), {3, 6, 9}, detections, scores)
+
+    shape, analyzed, loaded, loaded_scores = DetectionCache(video, PARAMS, str(tmp_path)).load()
+    assert shape == (480, 640)
+    assert analyzed == {3, 6, 9}
+    assert loaded.keys() == detections.keys()
+    for nth_frame, points in detections.items():
+        assert loaded[nth_frame].shape == (48, 1, 2)
+        np.testing.assert_array_equal(loaded[nth_frame], points)
+    assert loaded_scores == scores
+
+def test_round_trip_without_detections(video, tmp_path):
+    cache = DetectionCache(video, PARAMS, str(tmp_path))
+    cache.save((480, 640), {1, 2}, {})
+    assert cache.load() == ((480, 640), {1, 2}, {}, {})
+
+def test_missing_entry(video, tmp_path):
+    assert DetectionCache(video, PARAMS, str(tmp_path)).load() is None
+
+def test_settings_and_video_are_part_of_the_key(video, tmp_path):
+    cache = DetectionCache(video, PARAMS, str(tmp_path))
+    cache.save((480, 640), {1}, {1: corners(0)})
+    assert DetectionCache(video, dict(PARAMS, scale=0.5), str(tmp_path)).load() is None
+    with open(video, "ab") as video_file:
+        video_file.write(b"re-encoded")
+    assert DetectionCache(video, PARAMS, str(tmp_path)).load() is None
+
+def test_corrupt_entry_is_ignored(video, tmp_path):
+    cache = DetectionCache(video, PARAMS, str(tmp_path))
+    with open(cache.path, "wb") as cache_file:
+        cache_file.write(b"not an npz")
+    assert cache.load() is None
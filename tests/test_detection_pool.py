@@ -0,0 +1,24 @@
+import numpy as np
+
+from CameraWidget.detection import ChessboardDetector
+from CameraWidget.detection_pool import DetectionPool, chunked
+
+def test_chunked():
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+
+def test_pool_finds_every_board_in_frame_order(board_video):
+    path, truth = board_video
+    frames = list(range(1, 31))
+    pool = DetectionPool(2, chunk_size=4)
+    results = list(pool.detect(path, frames, ChessboardDetector(8, 6), video_backend="opencv"))
+    assert [nth_frame for _, nth_frame, _, _ in results] == frames
+    for shape, nth_frame, corners, score in results:
+        assert shape == (480, 640)
+        assert score is None
+        if nth_frame in truth:
+            # MJPG compression costs a little accuracy.
+            assert np.abs(corners - truth[nth_frame]).max() < 0.5
+        else:
+            assert corners is None
+    assert pool.missed == 0
@@ -0,0 +1,94 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from CameraWidget.frame_sampler import FrameSampler, bisection_order, sample_indices
+
+class FakeReader:
+    '''
+    A video whose frames are their own 0-based index. With overshoot,
+    every seek but one to the start lands that many frames past its target.
+    '''
+    def __init__(self, frames, overshoot=0):
+        self.frames = frames
+        self.overshoot = overshoot
+        self.index = 0
+
+    def position(self):
+        return self.index
+
+    def intra_only(self):
+        return False
+
+    def seek(self, index):
+        if index == 0 or not self.overshoot:
+            self.index = index
+            return True
+        self.index = min(index + self.overshoot, self.frames)
+        return False
+
+    def grab(self):
+        if self.index >= self.frames:
+            return False
+        self.index += 1
+        return True
+
+    def read(self):
+        if self.index >= self.frames:
+            return False, None
+        self.index += 1
+        return True, self.index - 1
+
+def test_sample_indices_count_from_one():
+    assert list(sample_indices(10, 3)) == [3, 6, 9]
+    assert list(sample_indices(10, 1)) == list(range(1, 11))
+
+def test_sample_indices_resume_after_start():
+    assert list(sample_indices(20, 5, start=7)) == [10, 15, 20]
+
+def test_sample_indices_without_frame_count_are_open_ended():
+    assert list(itertools.islice(sample_indices(0, 4), 3)) == [4, 8, 12]
+
+@pytest.mark.parametrize("rate", [1, 2, 7])
+def test_sample_indices_cover_each_frame_once(rate):
+    frames = list(sample_indices(100, rate))
+    assert len(frames) == len(set(frames)) == 100 // rate
+    assert all(nth_frame % rate == 0 for nth_frame in frames)
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 7, 8, 9, 100, 1000])
+def test_bisection_order_visits_every_frame_once(count):
+    frames = list(range(2, 2 * count + 1, 2))
+    order = list(bisection_order(frames))
+    assert len(order) == len(frames)
+    assert sorted(order) == frames
+
+def test_bisection_order_goes_coarse_to_fine():
+    assert list(bisection_order(range(1, 10))) == [1, 9, 5, 3, 7, 2, 4, 6, 8]
+    # Any prefix is spread over the whole range.
+    prefix = list(bisection_order(range(1000)))[:16]
+    assert np.diff(sorted(prefix)).max() <= 64
+
+@pytest.mark.parametrize("strategy", ["auto", "grab", "seek", "read"])
+def test_sampler_decodes_requested_frames(strategy):
+    indices = [1, 2, 10, 50, 51, 99, 3]
+    sampler = FrameSampler(FakeReader(100), indices, strategy)
+    assert list(sampler) == [(nth_frame, nth_frame - 1) for nth_frame in indices]
+    assert sampler.stats["missed"] == 0
+
+def test_sampler_stops_at_end_of_stream():
+    assert list(FrameSampler(FakeReader(100), [5, 200, 300])) == [(5, 4)]
+
+def test_sampler_rejects_unknown_strategy():
+    with pytest.raises(ValueError):
+        FrameSampler(FakeReader(10), [1], "skip")
+
+def test_overshooting_seek_falls_back_to_grabbing():
+    sampler = FrameSampler(FakeReader(100, overshoot=3), [1, 60, 90], "seek")
+    assert list(sampler) == [(1, 0), (60, 59), (90, 89)]
+    assert sampler.stats["missed"] == 0
+
+def test_frame_behind_an_overshooting_seek_is_missed():
+    sampler = FrameSampler(FakeReader(100, overshoot=3), [60, 10, 90], "seek")
+    assert list(sampler) == [(60, 59), (90, 89)]
+    assert sampler.stats["missed"] == 1
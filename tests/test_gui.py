@@ -0,0 +1,17 @@
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+
+def test_import_does_not_start_the_app(monkeypatch):
+    # A spawned detection worker imports the main script like this.
+    monkeypatch.delitem(sys.modules, "gui", raising=False)
+    started = []
+    monkeypatch.setattr(QApplication, "exec", lambda self=None: started.append(True))
+    app = QApplication.instance()
+    import gui
+    assert callable(gui.main)
+    assert not started
+    assert QApplication.instance() is app
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from CameraWidget.online_estimator import OnlineEstimator
+
+SHAPE = (480, 640)
+
+def noisy_views(board_views, count, seed=0):
+    _, _, points = board_views(count, seed=seed)
+    rng = np.random.default_rng(seed)
+    return (points + rng.normal(0, 0.5, points.shape)).astype(np.float32)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_solves_only_when_new_views_arrived(objp, board_views):
+    points = noisy_views(board_views, 12)
+    estimates = []
+    estimator = OnlineEstimator(objp, 8, 6, estimates.append, distorted=False, min_views=5)
+    for nth_frame, corners in enumerate(points[:4]):
+        estimator.add(nth_frame, corners, SHAPE)
+    estimator.solve()
+    assert estimates == []
+    estimator.add(4, points[4], SHAPE)
+    estimator.solve()
+    estimator.solve()
+    assert [views for views, _, _, _ in estimates] == [5]
+    for nth_frame, corners in enumerate(points[5:], 5):
+        estimator.add(nth_frame, corners, SHAPE)
+    estimator.solve()
+    assert [views for views, _, _, _ in estimates] == [5, 12]
+
+def test_thread_solves_once_per_interval_with_new_views(objp, board_views):
+    points = noisy_views(board_views, 10)
+    estimates = []
+    estimator = OnlineEstimator(objp, 8, 6, estimates.append, distorted=False, interval=0.02)
+    estimator.start()
+    try:
+        for nth_frame, corners in enumerate(points):
+            estimator.add(nth_frame, corners, SHAPE)
+        assert wait_for(lambda: estimates and estimates[-1][0] == 10)
+        solves = len(estimates)
+        time.sleep(0.2)
+        # No new views, so ten more intervals bring no new solves.
+        assert len(estimates) == solves
+    finally:
+        estimator.stop()
+
+def test_stop_joins_the_thread_without_waiting_out_the_interval(objp, board_views):
+    estimates = []
+    estimator = OnlineEstimator(objp, 8, 6, estimates.append, distorted=False, interval=60)
+    estimator.start()
+    thread = estimator.thread
+    for nth_frame, corners in enumerate(noisy_views(board_views, 10)):
+        estimator.add(nth_frame, corners, SHAPE)
+    started = time.monotonic()
+    estimator.stop()
+    assert time.monotonic() - started < 1
+    assert not thread.is_alive()
+    assert estimator.thread is None
+    assert estimates == []
+    estimator.stop()
+
+def test_streamed_estimates_converge_on_the_final_calibration(objp, mtx, board_views):
+    points = noisy_views(board_views, 60, seed=3)
+    estimates = []
+    estimator = OnlineEstimator(objp, 8, 6, estimates.append, distorted=False, max_views=20)
+    for nth_frame, corners in enumerate(points):
+        estimator.add(nth_frame, corners, SHAPE)
+        if nth_frame % 5 == 4:
+            estimator.solve()
+    assert len(estimates) == 12
+    final_rms, final_mtx, _, _, _ = cv2.calibrateCamera([objp] * len(points), list(points.reshape(len(points), -1, 1, 2)), SHAPE[::-1], None, None)
+    errors = [np.abs(estimate - final_mtx)[[0, 1, 0, 1], [0, 1, 2, 2]].max() for _, estimate, _, _ in estimates]
+    assert errors[-1] < errors[0]
+    assert errors[-1] < 1.0
+    assert abs(estimates[-1][1][0, 0] / mtx[0, 0] - 1) < 0.01
+    assert estimates[-1][3] < 1.0
@@ -0,0 +1,41 @@
+import random
+import threading
+import time
+
+import pytest
+
+from CameraWidget.pipeline import DetectionPipeline
+
+def slow_square(index, value):
+    # Uneven work makes the detect threads finish out of order.
+    time.sleep(random.uniform(0, 0.002))
+    return index, value * value
+
+@pytest.mark.parametrize("detect_threads", [1, 3])
+def test_results_come_back_in_input_order(detect_threads):
+    pipeline = DetectionPipeline(queue_depth=2, detect_threads=detect_threads)
+    frames = [(i, i + 1) for i in range(200)]
+    assert list(pipeline.run(frames, slow_square)) == [(i, (i + 1) ** 2) for i in range(200)]
+    assert set(pipeline.utilization()) == {"decode", "detect", "collect"}
+
+def test_errors_are_raised_in_the_caller():
+    def detect(index):
+        if index == 5:
+            raise RuntimeError("bad frame")
+        return index
+    with pytest.raises(RuntimeError, match="bad frame"):
+        list(DetectionPipeline(detect_threads=2).run(((i,) for i in range(50)), detect))
+
+def test_closing_early_stops_every_stage():
+    decoded = []
+    def frames():
+        for i in range(10000):
+            decoded.append(i)
+            yield (i,)
+    before = threading.active_count()
+    results = DetectionPipeline(queue_depth=2, detect_threads=2).run(frames(), lambda i: i)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    results.close()
+    assert threading.active_count() == before
+    # Bounded queues keep decoding from running far ahead.
+    assert len(decoded) < 20
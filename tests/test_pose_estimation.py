@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+import pytest
+
+from CameraWidget.pose_estimation import estimate_poses, rotations_to_rvecs
+
+def rotation_error(rvec, expected):
+    R = cv2.Rodrigues(np.asarray(rvec, dtype=np.float64))[0]
+    R_expected = cv2.Rodrigues(np.asarray(expected, dtype=np.float64))[0]
+    return np.degrees(np.arccos(np.clip((np.trace(R @ R_expected.T) - 1) / 2, -1, 1)))
+
+def test_recovers_poses_of_exact_views(objp, mtx, board_views):
+    rvecs, tvecs, points = board_views(20)
+    found_r, found_t, fallback = estimate_poses(objp, points, mtx)
+    assert fallback == []
+    for rvec, tvec, expected_r, expected_t in zip(found_r, found_t, rvecs, tvecs):
+        assert rotation_error(rvec, expected_r) < 1e-3
+        np.testing.assert_allclose(tvec.ravel(), expected_t, atol=1e-4)
+
+def test_recovers_poses_through_distortion(objp, mtx, board_views):
+    dist = np.array([-0.2, 0.08, 0.001, -0.0005, 0.0])
+    rvecs, tvecs, points = board_views(10, dist=dist, seed=1)
+    found_r, found_t, fallback = estimate_poses(objp, points, mtx, dist, refine=True)
+    assert fallback == []
+    for rvec, tvec, expected_r, expected_t in zip(found_r, found_t, rvecs, tvecs):
+        assert rotation_error(rvec, expected_r) < 0.01
+        np.testing.assert_allclose(tvec.ravel(), expected_t, atol=1e-3)
+
+def test_noisy_views_stay_close(objp, mtx, board_views):
+    rvecs, tvecs, points = board_views(20, seed=2)
+    noisy = points + np.random.default_rng(0).normal(0, 0.3, points.shape).astype(np.float32)
+    found_r, found_t, _ = estimate_poses(objp, noisy, mtx)
+    for rvec, tvec, expected_r, expected_t in zip(found_r, found_t, rvecs, tvecs):
+        assert rotation_error(rvec, expected_r) < 0.5
+        assert np.linalg.norm(tvec.ravel() - expected_t) < 0.1
+
+def test_views_far_off_fall_back_to_ransac(objp, mtx, board_views):
+    _, _, points = board_views(5, seed=3)
+    # One view with its corners scrambled fits no homography.
+    points[2] = points[2][np.random.default_rng(0).permutation(len(objp))]
+    _, _, fallback = estimate_poses(objp, points, mtx)
+    assert fallback == [2]
+
+def test_rejects_non_planar_targets(objp, mtx, board_views):
+    _, _, points = board_views(2)
+    objp = objp.copy()
+    objp[0, 2] = 1
+    with pytest.raises(ValueError):
+        estimate_poses(objp, points, mtx)
+
+def test_rotations_to_rvecs_match_rodrigues():
+    rng = np.random.default_rng(0)
+    rvecs = np.concatenate([
+        rng.normal(0, 1, (20, 3)),
+        [[0, 0, 0], [1e-9, 0, 0], [np.pi - 1e-9, 0, 0], [0, 0, np.pi]],
+    ])
+    R = np.array([cv2.Rodrigues(rvec)[0] for rvec in rvecs])
+    for rvec, expected in zip(rotations_to_rvecs(R), R):
+        np.testing.assert_allclose(cv2.Rodrigues(rvec)[0], expected, atol=1e-7)
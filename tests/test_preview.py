@@ -0,0 +1,63 @@
+import functools
+
+import numpy as np
+import pytest
+
+from CameraWidget import calibration_engine
+from CameraWidget.preview import THUMBNAIL_HEIGHT, PreviewThrottle, make_thumbnail
+
+class FakeClock:
+    def __init__(self, step):
+        self.step = step
+        self.now = 0.0
+
+    def __call__(self):
+        now = self.now
+        self.now += self.step
+        return now
+
+def test_throttle_limits_the_rate():
+    # Calls every 1/32 s against a 10 fps limit pass every fourth call.
+    throttle = PreviewThrottle(10, clock=FakeClock(1 / 32))
+    assert [throttle.ready() for _ in range(12)] == [True, False, False, False] * 3
+
+def test_throttle_without_limit():
+    throttle = PreviewThrottle(0, clock=FakeClock(0))
+    assert all(throttle.ready() for _ in range(5))
+
+@pytest.mark.parametrize("shape", [(480, 640), (1080, 1920, 3), (128, 50, 3)])
+def test_thumbnail_size(shape):
+    frame = np.zeros(shape, np.uint8)
+    thumbnail, scale = make_thumbnail(frame)
+    assert thumbnail.shape[0] == THUMBNAIL_HEIGHT
+    assert thumbnail.shape[1] == round(shape[1] * THUMBNAIL_HEIGHT / shape[0])
+    assert thumbnail.shape[2:] == shape[2:]
+    assert scale == THUMBNAIL_HEIGHT / shape[0]
+    # A frame already at thumbnail size goes out as it is.
+    assert (thumbnail is frame) == (shape[0] == THUMBNAIL_HEIGHT)
+
+def test_engine_emits_throttled_thumbnails(board_video, monkeypatch):
+    monkeypatch.setattr(calibration_engine, "PreviewThrottle", functools.partial(PreviewThrottle, clock=FakeClock(1 / 32)))
+    previews = []
+    def progress(args):
+        if args[2].startswith("Detecting"):
+            previews.append(args[1])
+    engine = calibration_engine.CalibrationEngine(
+        board_video[0],
+        8,
+        6,
+        0,
+        False,
+        False,
+        1,
+        False,
+        cache_dir=None,
+        estimate_interval=0,
+        video_backend="opencv",
+        preview_fps=10,
+        progress=progress,
+    )
+    engine.run()
+    # 30 frames, one emission every fourth.
+    assert len(previews) == 8
+    assert all(preview.shape == (THUMBNAIL_HEIGHT, 171, 3) for preview in previews)
@@ -0,0 +1,48 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from CameraWidget.reorient import Reorienter
+
+SHAPE = (48, 64)
+
+def marker_frame(x, y):
+    frame = np.zeros(SHAPE, np.uint8)
+    frame[y, x] = 255
+    return frame
+
+def centroid(frame):
+    ys, xs = np.indices(frame.shape)
+    weight = frame.astype(np.float64)
+    return np.array([(xs * weight).sum(), (ys * weight).sum()]) / weight.sum()
+
+@pytest.mark.parametrize("rotate, v_flip, h_flip", list(itertools.product([0, 90, 180, 270], [False, True], [False, True])))
+def test_right_angles_move_pixels_where_the_corner_map_says(rotate, v_flip, h_flip):
+    reorienter = Reorienter(rotate, v_flip, h_flip)
+    points = np.array([[0, 0], [63, 0], [0, 47], [63, 47], [10, 5], [40, 30]], np.float32)
+    mapped = reorienter.transform_points(points, SHAPE)
+    for point, expected in zip(points.astype(int), mapped):
+        out = reorienter(marker_frame(*point))
+        assert out.shape == reorienter.output_shape(SHAPE)
+        y, x = np.argwhere(out == 255)[0]
+        assert (x, y) == tuple(expected)
+
+@pytest.mark.parametrize("rotate, v_flip, h_flip", [(30, False, False), (-45, True, False), (100, False, True)])
+def test_arbitrary_angles_move_pixels_where_the_corner_map_says(rotate, v_flip, h_flip):
+    reorienter = Reorienter(rotate, v_flip, h_flip)
+    frame = np.zeros(SHAPE, np.uint8)
+    frame[20:25, 30:35] = 255
+    expected = reorienter.transform_points(np.array([[32.0, 22.0]]), SHAPE)[0]
+    out = reorienter(frame)
+    assert out.shape == SHAPE
+    np.testing.assert_allclose(centroid(out), expected, atol=0.1)
+
+def test_identity():
+    reorienter = Reorienter()
+    frame = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    assert reorienter.is_identity()
+    assert reorienter(frame) is frame
+    assert not Reorienter(180).is_identity()
+    # Rotating half way round is both flips.
+    np.testing.assert_array_equal(Reorienter(180)(frame), Reorienter(0, True, True)(frame))
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+import pytest
+
+from CameraWidget.dataset import CalibrationDataset
+from CameraWidget.rig_calibration import align_orientation, board_pose, calibrate_rig, join_detections, turned_pose
+
+def rotation_error(R, R_true):
+    return np.degrees(np.arccos(np.clip((np.trace(R @ R_true.T) - 1) / 2, -1, 1)))
+
+def random_rotations(rng, count, spread=0.4):
+    return np.stack([cv2.Rodrigues(rng.normal(0, spread, 3))[0] for _ in range(count)])
+
+def test_join_detections_applies_offsets():
+    corners = np.zeros((48, 1, 2), np.float32)
+    joined = join_detections([{1: corners, 2: corners, 5: corners}, {3: corners, 9: corners}], offsets=[0, -1])
+    assert sorted(joined) == [2]
+    assert sorted(joined[2]) == [0, 1]
+    assert joined[2][0].shape == (48, 2)
+
+def test_turned_pose_fits_the_reversed_corners(objp, mtx, board_views):
+    rvecs, tvecs, points = board_views(5)
+    objp = objp.astype(np.float64)
+    for corners in points:
+        R, t = board_pose(objp, corners, mtx, np.zeros(5))
+        R_turned, t_turned = turned_pose(objp, R, t)
+        projected, _ = cv2.projectPoints(objp, cv2.Rodrigues(R_turned)[0], t_turned, mtx, np.zeros(5))
+        assert np.abs(projected.reshape(-1, 2) - corners[::-1]).max() < 1e-3
+        R_pnp, t_pnp = board_pose(objp, corners[::-1], mtx, np.zeros(5))
+        assert rotation_error(R_turned, R_pnp) < 1e-4
+        np.testing.assert_allclose(t_turned, t_pnp, atol=1e-4)
+
+def test_align_orientation_picks_the_turned_views():
+    rng = np.random.default_rng(1)
+    rotations_a = random_rotations(rng, 50)
+    relative = cv2.Rodrigues(np.array([0.1, 0.7, -0.2]))[0]
+    rotations_b = relative @ rotations_a
+    turned = rng.random(50) < 0.3
+    rotations_b[turned] = rotations_b[turned] * [-1, -1, 1]
+    # A few views whose pose is wrong either way round.
+    rotations_b[:3] = random_rotations(rng, 3, spread=2.0)
+    assert np.array_equal(align_orientation(rotations_a, rotations_b)[3:], turned[3:])
+    # Which way round counts as right is only defined up to turning all.
+    assert np.array_equal(align_orientation(rotations_a, rotations_b * [-1, -1, 1])[3:], ~turned[3:])
+
+def test_calibrate_rig_recovers_the_extrinsics(synthetic_rig):
+    datasets, intrinsics, extrinsics = synthetic_rig(cameras=3, frames=40)
+    detections = [{frame: corners.copy() for frame, corners in dataset.detections.items()} for dataset in datasets]
+    messages = []
+    rig = calibrate_rig(datasets, 8, 6, progress=messages.append)
+    assert rig.connected() == [0, 1, 2]
+    assert rig.rms < 0.35
+    for camera in (1, 2):
+        R, t = rig.extrinsics[camera]
+        R_true, t_true = extrinsics[camera]
+        assert rotation_error(R, R_true) < 0.1
+        assert np.linalg.norm(t - t_true) < 0.05
+    assert messages[0].startswith("Placing camera 2 of 3")
+    assert messages[-1].startswith("Refining 3 cameras")
+    # Views were turned in the rig's copy only.
+    for dataset, frames in zip(datasets, detections):
+        assert all(np.array_equal(dataset.detections[frame], corners) for frame, corners in frames.items())
+
+def test_camera_sharing_too_few_frames_is_not_placed(synthetic_rig, objp):
+    datasets, _, _ = synthetic_rig(cameras=2, frames=20)
+    loner = CalibrationDataset(objp)
+    loner.mtx, loner.dist, loner.shape = datasets[0].mtx, None, datasets[0].shape
+    loner.detections = dict(list(datasets[0].detections.items())[:3])
+    rig = calibrate_rig(datasets + [loner], 8, 6)
+    assert rig.connected() == [0, 1]
+    assert rig.extrinsics[2] is None
+    assert all(2 not in views for views in rig.observations.values())
@@ -0,0 +1,61 @@
+import pickle
+
+import cv2
+import numpy as np
+
+from CameraWidget.detection import ChessboardDetector, detect_oriented
+from CameraWidget.reorient import Reorienter
+from CameraWidget.sharpness import SharpnessGate, sharpness
+
+def test_blur_lowers_the_score(render_board):
+    frame, _ = render_board()
+    blurred = cv2.GaussianBlur(frame, (0, 0), 3)
+    assert sharpness(blurred) < 0.5 * sharpness(frame)
+    colour = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+    assert np.isclose(sharpness(colour), sharpness(frame), rtol=0.05)
+
+def test_gate_searches_everything_until_calibrated(render_board):
+    frame, _ = render_board()
+    blurred = cv2.GaussianBlur(frame, (0, 0), 3)
+    gate = SharpnessGate(fraction=0.5)
+    assert gate(blurred)[0]
+    gate.calibrate([])
+    assert gate.threshold is None
+    gate.calibrate([frame, frame, blurred])
+    assert gate.threshold == 0.5 * sharpness(frame)
+    accepted, score = gate(blurred)
+    assert not accepted
+    assert score == sharpness(blurred)
+    assert gate(frame)[0]
+    assert gate.skipped == 1
+
+def test_decisions_do_not_depend_on_earlier_frames(render_board):
+    frame, _ = render_board()
+    frames = [cv2.GaussianBlur(frame, (0, 0), sigma) if sigma else frame for sigma in (0, 2, 0, 0, 1, 3, 0, 2)]
+    gate = SharpnessGate()
+    gate.calibrate(frames)
+    decisions = [gate(frame)[0] for frame in frames]
+    assert not all(decisions) and any(decisions)
+    assert [gate(frame)[0] for frame in frames[::-1]] == decisions[::-1]
+
+def test_gate_pickles_with_its_threshold(render_board):
+    frame, _ = render_board()
+    gate = SharpnessGate()
+    gate.calibrate([frame])
+    copy = pickle.loads(pickle.dumps(gate))
+    assert copy.threshold == gate.threshold
+    assert copy.get_params() == gate.get_params()
+    assert copy(frame)[0]
+
+def test_rejected_frame_is_not_searched(render_board):
+    frame, _ = render_board()
+    gate = SharpnessGate()
+    gate.calibrate([frame])
+    detector = ChessboardDetector(8, 6)
+    reorienter = Reorienter(90, False, False)
+    searched, shape, corners, score = detect_oriented(detector, reorienter, frame, gate=gate)
+    assert corners is not None and score > 0
+    blurred = cv2.GaussianBlur(frame, (0, 0), 3)
+    searched, shape, corners, score = detect_oriented(detector, reorienter, blurred, gate=gate)
+    assert searched is None and corners is None
+    assert shape == frame.shape[::-1]
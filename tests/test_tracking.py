@@ -0,0 +1,29 @@
+import numpy as np
+
+from CameraWidget.detection import ChessboardDetector
+from CameraWidget.tracking import CornerTracker
+
+def test_follows_a_moving_board(render_board):
+    tracker = CornerTracker(ChessboardDetector(8, 6))
+    for step in range(6):
+        frame, corners = render_board(angle=step, offset=(3.0 * step, -2.0 * step))
+        found = tracker.detect(frame)
+        assert np.abs(found - corners).max() < 0.2
+    assert tracker.stats == {"tracked": 5, "searched": 1, "lost": 0}
+
+def test_searches_again_once_the_board_is_gone(render_board):
+    tracker = CornerTracker(ChessboardDetector(8, 6))
+    frame, _ = render_board()
+    assert tracker.detect(frame) is not None
+    assert tracker.detect(np.full_like(frame, 255)) is None
+    assert tracker.stats == {"tracked": 0, "searched": 2, "lost": 1}
+    frame, corners = render_board(offset=(10.0, 5.0))
+    assert np.abs(tracker.detect(frame) - corners).max() < 0.2
+    assert tracker.stats["searched"] == 3
+
+def test_rejects_a_grid_that_is_no_longer_regular():
+    tracker = CornerTracker(ChessboardDetector(8, 6))
+    grid = np.mgrid[0:8, 0:6].T.reshape(-1, 1, 2).astype(np.float32) * 30 + 100
+    assert tracker.is_regular(grid)[0]
+    grid[20] += 12
+    assert not tracker.is_regular(grid)[0]
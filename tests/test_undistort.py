@@ -0,0 +1,97 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from CameraWidget.undistort import MAX_CACHED_MAPS, Undistorter, get_undistorter, scaled_camera_matrix, undistort_thumbnail
+
+DIST = np.array([-0.25, 0.08, 0.001, -0.002, 0.0])
+SIZE = (640, 480)
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)
+    return cv2.resize(noise, SIZE, interpolation=cv2.INTER_CUBIC)
+
+def test_matches_cv2_undistort(mtx, frame):
+    undistorter = Undistorter(mtx, DIST, SIZE)
+    expected = cv2.undistort(frame, mtx, DIST, None, undistorter.new_mtx)
+    undistorted = undistorter(frame, crop=False)
+    assert undistorted.shape == frame.shape
+    # The fixed point maps round coordinates to 1/32 of a pixel.
+    difference = np.abs(undistorted.astype(int) - expected).astype(float)
+    assert difference.mean() < 2
+
+def test_crop_keeps_the_valid_region(mtx, frame):
+    undistorter = Undistorter(mtx, DIST, SIZE, alpha=1.0)
+    x, y, w, h = undistorter.roi
+    assert undistorter(frame).shape[:2] == (h, w)
+
+def test_maps_are_cached_on_disk(mtx, frame, tmp_path):
+    built = Undistorter(mtx, DIST, SIZE, cache_dir=str(tmp_path))
+    assert all(path.startswith(str(tmp_path)) for path in built.paths(str(tmp_path)))
+    loaded = Undistorter(mtx, DIST, SIZE, cache_dir=str(tmp_path))
+    assert isinstance(loaded.map1, np.memmap)
+    np.testing.assert_array_equal(loaded.map1, built.map1)
+    np.testing.assert_array_equal(loaded.map2, built.map2)
+    np.testing.assert_array_equal(loaded(frame), built(frame))
+
+def test_corrupt_cache_is_rebuilt(mtx, tmp_path):
+    built = Undistorter(mtx, DIST, SIZE, cache_dir=str(tmp_path))
+    for path in built.paths(str(tmp_path)):
+        with open(path, "wb") as map_file:
+            map_file.write(b"not a map")
+    rebuilt = Undistorter(mtx, DIST, SIZE, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(rebuilt.map1, built.map1)
+
+def test_wrong_frame_size(mtx):
+    undistorter = Undistorter(mtx, DIST, SIZE)
+    with pytest.raises(ValueError):
+        undistorter(np.zeros((240, 320, 3), np.uint8))
+
+def test_get_undistorter_is_shared(mtx):
+    undistorter = get_undistorter(mtx, DIST, SIZE)
+    assert get_undistorter(mtx.copy(), DIST.copy(), SIZE) is undistorter
+    assert get_undistorter(mtx, DIST, SIZE, alpha=0.0) is not undistorter
+
+def test_disk_cache_keeps_the_most_recent_maps(mtx, tmp_path):
+    cache_dir = str(tmp_path)
+    first = Undistorter(mtx, DIST, SIZE, cache_dir=cache_dir)
+    for i in range(MAX_CACHED_MAPS):
+        os.utime(first.paths(cache_dir)[0], (0, i))
+        Undistorter(mtx, DIST * (i + 2), SIZE, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 2 * MAX_CACHED_MAPS
+    assert not os.path.exists(first.paths(cache_dir)[0])
+
+def test_loading_maps_marks_them_recent(mtx, tmp_path):
+    cache_dir = str(tmp_path)
+    first = Undistorter(mtx, DIST, SIZE, cache_dir=cache_dir)
+    for i in range(MAX_CACHED_MAPS):
+        os.utime(first.paths(cache_dir)[0], (0, 0))
+        Undistorter(mtx, DIST, SIZE, cache_dir=cache_dir)
+        Undistorter(mtx, DIST * (i + 2), SIZE, cache_dir=cache_dir)
+    assert os.path.exists(first.paths(cache_dir)[0])
+
+def test_scaled_camera_matrix_follows_resize(mtx):
+    point = np.array([[[100.0, 50.0]]])
+    scaled = scaled_camera_matrix(mtx, 0.25, 0.5)
+    normalized = cv2.undistortPoints(point, mtx, None)
+    resized = (point + 0.5) * [0.25, 0.5] - 0.5
+    np.testing.assert_allclose(cv2.undistortPoints(resized, scaled, None), normalized, atol=1e-12)
+
+def test_thumbnail_is_undistorted_at_thumbnail_size(mtx):
+    x, y = np.meshgrid(np.arange(SIZE[0]), np.arange(SIZE[1]))
+    checkers = ((x // 80 + y // 80) % 2 * 255).astype(np.uint8)
+    frame = cv2.GaussianBlur(cv2.cvtColor(checkers, cv2.COLOR_GRAY2BGR), (0, 0), 4)
+    small = (152, 114)
+    expected = cv2.resize(Undistorter(mtx, DIST, SIZE)(frame, crop=False), small, interpolation=cv2.INTER_AREA)
+    shrunk = cv2.resize(frame, small, interpolation=cv2.INTER_AREA)
+    undistorter = Undistorter(scaled_camera_matrix(mtx, 152 / 640, 114 / 480), DIST, small)
+    assert np.abs(undistorter(shrunk, crop=False).astype(int) - expected).mean() < 3
+    assert np.abs(shrunk.astype(int) - expected).mean() > 30
+
+    thumbnail = undistort_thumbnail(frame, mtx, DIST, height=114)
+    full_roi = np.array(Undistorter(mtx, DIST, SIZE).roi[2:])
+    np.testing.assert_allclose(thumbnail.shape[1::-1], full_roi * 114 / 480, atol=2)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from CameraWidget.video_reader import available_backends, open_reader
+
+@pytest.fixture(params=available_backends())
+def backend(request):
+    return request.param
+
+def mean_intensity(frame):
+    return float(np.mean(frame))
+
+def test_reads_every_frame(board_video, backend):
+    path, _ = board_video
+    reader = open_reader(path, backend)
+    assert reader.frame_count() == 30
+    frames = []
+    while True:
+        status, frame = reader.read()
+        if not status:
+            break
+        frames.append(frame)
+    assert len(frames) == 30
+    assert frames[0].shape[:2] == (480, 640)
+    assert reader.position() == 30
+
+def test_grab_and_seek_keep_position(board_video, backend):
+    path, _ = board_video
+    sequential = open_reader(path, backend)
+    frames = [sequential.read()[1] for _ in range(30)]
+
+    reader = open_reader(path, backend)
+    assert reader.grab() and reader.grab()
+    assert reader.position() == 2
+    status, frame = reader.read()
+    assert status and reader.position() == 3
+    np.testing.assert_allclose(mean_intensity(frame), mean_intensity(frames[2]), atol=0.5)
+    # MJPG frames are all keyframes, so seeks land exactly.
+    for index in (20, 4, 29):
+        assert reader.seek(index)
+        assert reader.position() == index
+        status, frame = reader.read()
+        assert status
+        np.testing.assert_allclose(mean_intensity(frame), mean_intensity(frames[index]), atol=0.5)
+    assert reader.intra_only()
+
+def test_gray_frames_are_single_channel(board_video, backend):
+    reader = open_reader(board_video[0], backend, gray=True)
+    status, frame = reader.read()
+    assert status
+    # OpenCV has no portable way to hand over luma and stays BGR.
+    assert reader.gray == (backend == "pyav")
+    assert frame.ndim == (2 if reader.gray else 3)
+
+def test_unknown_backend(board_video):
+    with pytest.raises(ValueError):
+        open_reader(board_video[0], "gstreamer")
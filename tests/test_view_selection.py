@@ -0,0 +1,59 @@
+import numpy as np
+
+from CameraWidget.view_selection import MIN_VIEWS, CoverageMonitor, DuplicateFilter, select_views, view_features
+
+SHAPE = (480, 640)
+
+def test_fewer_views_than_max_are_all_kept(board_views):
+    _, _, points = board_views(5)
+    assert select_views(points, SHAPE, 8, 6, 10) == [0, 1, 2, 3, 4]
+    assert select_views(points, SHAPE, 8, 6, None) == [0, 1, 2, 3, 4]
+
+def test_selection_is_sorted_unique_and_bounded(board_views):
+    _, _, points = board_views(80)
+    kept = select_views(points, SHAPE, 8, 6, 20)
+    assert len(kept) == 20
+    assert kept == sorted(set(kept))
+
+def test_limit_is_at_least_min_views(board_views):
+    _, _, points = board_views(10)
+    assert len(select_views(points, SHAPE, 8, 6, 0)) == MIN_VIEWS
+    assert len(select_views(points, SHAPE, 8, 6, 1)) == MIN_VIEWS
+
+def test_selection_prefers_new_views_over_repeats(board_views):
+    _, _, points = board_views(6)
+    # The first view held still for 50 frames, then five others.
+    repeated = np.concatenate([np.repeat(points[:1], 50, axis=0), points[1:]])
+    kept = select_views(repeated, SHAPE, 8, 6, 6)
+    assert kept[1:] == list(range(50, 55))
+
+def test_every_view_fills_one_bin_per_pose_feature(board_views):
+    _, _, points = board_views(10)
+    features = view_features(points, SHAPE, 8, 6)
+    cells = 8 * 8
+    assert np.all(features[:, :cells].sum(axis=1) >= 1)
+    assert np.all(features[:, cells:].sum(axis=1) == 4)
+
+def test_coverage_monitor(board_views):
+    _, _, points = board_views(30)
+    monitor = CoverageMonitor(8, 6, min_views=10, min_coverage=0.0, min_poses=1)
+    for corners in points[:9]:
+        monitor.add(corners, SHAPE)
+    assert not monitor.satisfied()
+    monitor.add(points[9], SHAPE)
+    assert monitor.satisfied()
+    assert 0 < monitor.coverage() <= 1
+    assert monitor.summary().startswith("10 views")
+
+def test_duplicate_filter(board_views):
+    _, _, points = board_views(3)
+    duplicates = DuplicateFilter(min_motion=2.0, window=2)
+    assert duplicates.accept(points[0])
+    assert not duplicates.accept(points[0] + 0.5)
+    assert duplicates.accept(points[1])
+    assert duplicates.accept(points[0] + 3.0)
+    assert not duplicates.accept(points[1] + 0.5)
+    assert duplicates.accept(points[2])
+    # The first view has left the window, so it is new again.
+    assert duplicates.accept(points[0])
+    assert (duplicates.accepted, duplicates.suppressed) == (5, 2)